@@ -0,0 +1,39 @@
+'''
+
+Benchmark prdb_req.Organization.PeerOrganization on synthetic netixlan sets.
+
+Usage: python -m benchmarks.bench_peer_organization [records ...]
+'''
+import sys
+import time
+from benchmarks.synthetic import synthetic_network, FixtureBackend
+from utilities.prdb_requests.prdb_req import Organization
+
+SIZES = (1000, 10000, 50000, 100000)
+
+
+def bench_peer_organization(records, repeat=3):
+    """
+    :param records: number of netixlan records of the synthetic network
+    :param repeat: runs per size, the fastest is reported
+    :return: (exchanges, exchange organizations, seconds)
+    """
+    dataset = synthetic_network(records)
+    org_class = Organization(dataset['net'][0]['name'], backend=FixtureBackend(dataset))
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        org_class.PeerOrganization()
+        timings.append(time.perf_counter() - start)
+    return len(dataset['ix']), len(dataset['org']), min(timings)
+
+
+def main(sizes):
+    print(f'{"records":>10} {"exchanges":>10} {"ix orgs":>8} {"seconds":>10} {"us/record":>10}')
+    for records in sizes:
+        exchanges, ix_orgs, seconds = bench_peer_organization(records)
+        print(f'{records:>10} {exchanges:>10} {ix_orgs:>8} {seconds:>10.4f} {seconds / records * 1e6:>10.2f}')
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or SIZES)
@@ -0,0 +1,54 @@
+'''
+
+Benchmark es_graphs.sankey_data on synthetic comparisons.
+
+Usage: python -m benchmarks.bench_sankey
+'''
+import time
+import random
+from utilities.execsite_graphs.es_graphs import sankey_data
+
+# (organizations, exchanges per organization, distinct exchanges)
+CASES = (
+    (2, 100, 200),
+    (2, 1000, 2000),
+    (10, 1000, 2000),
+    (50, 1000, 5000),
+    (50, 5000, 20000),
+)
+
+
+def synthetic_comparison(orgs, exchanges_per_org, exchanges, seed=0):
+    """
+    :return: [(org_name, [(exchange_point, capacity), ...]), ...] as passed to sankey_data
+    """
+    rand = random.Random(seed)
+    exchange_names = [f'Exchange {i}' for i in range(exchanges)]
+    return [(f'Organization {i}', [(name, rand.choice((1000, 10000, 100000)))
+                                   for name in rand.sample(exchange_names, exchanges_per_org)])
+            for i in range(orgs)]
+
+
+def bench_sankey(orgs, exchanges_per_org, exchanges, repeat=3):
+    """
+    :return: (links, seconds) for the fastest run
+    """
+    org_conn_records = synthetic_comparison(orgs, exchanges_per_org, exchanges)
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        data = sankey_data(org_conn_records)
+        timings.append(time.perf_counter() - start)
+    return len(data['link']['value']), min(timings)
+
+
+def main():
+    print(f'{"orgs":>6} {"per org":>8} {"exchanges":>10} {"links":>8} {"seconds":>10} {"us/link":>8}')
+    for orgs, exchanges_per_org, exchanges in CASES:
+        links, seconds = bench_sankey(orgs, exchanges_per_org, exchanges)
+        print(f'{orgs:>6} {exchanges_per_org:>8} {exchanges:>10} {links:>8} {seconds:>10.4f} '
+              f'{seconds / links * 1e6:>8.2f}')
+
+
+if __name__ == '__main__':
+    main()
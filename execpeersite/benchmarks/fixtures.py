@@ -0,0 +1,33 @@
+'''
+
+Recorded PeeringDB responses converted to datasets for benchmarks.synthetic.FixtureBackend
+'''
+import os
+import json
+
+RECORDINGS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                              'utilities', 'prdb_requests', 'tests', 'data')
+RECORDINGS = ('prdb_net_1956',)
+
+
+def recorded_network(name='prdb_net_1956'):
+    """
+    Dataset of a recorded /net/<id> response. The recording only holds the network and its netixlan_set,
+    so exchanges are attached to operators by the first word of their name, i.e. Equinix Ashburn to Equinix.
+    :param name: file in utilities/prdb_requests/tests/data
+    :return: {'org': [...], 'ix': [...], 'net': [...], 'netixlan': [...]} lists of API objects
+    """
+    with open(os.path.join(RECORDINGS_DIR, name)) as recording:
+        net = json.load(recording)['data'][0]
+    netixlans = [dict(netixlan, net_id=net['id']) for netixlan in net['netixlan_set']]
+    exchanges = {}
+    for netixlan in netixlans:
+        exchanges.setdefault(netixlan['ix_id'], netixlan['name'])
+    operators = {}
+    for ix_id, ix_name in sorted(exchanges.items()):
+        operators.setdefault(ix_name.split()[0], len(operators) + 1)
+    orgs = [{'id': org_id, 'name': operator, 'status': 'ok'} for operator, org_id in operators.items()]
+    ixs = [{'id': ix_id, 'org_id': operators[ix_name.split()[0]], 'name': ix_name, 'status': 'ok'}
+           for ix_id, ix_name in sorted(exchanges.items())]
+    nets = [{key: value for key, value in net.items() if key not in ('netixlan_set', 'netfac_set', 'poc_set')}]
+    return {'org': orgs, 'ix': ixs, 'net': nets, 'netixlan': netixlans}
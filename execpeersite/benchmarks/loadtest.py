@@ -0,0 +1,338 @@
+'''
+
+Load test of the web app: seeds a local database, serves PeeringDB from benchmarks.peeringdb_stub,
+starts the app under runserver or gunicorn and drives a weighted mix of views at a fixed concurrency.
+Reports throughput and p50/p95/p99 latency per route.
+
+Usage: python -m benchmarks.loadtest [--server gunicorn --workers 4] [--concurrency 16] [--duration 30]
+       python -m benchmarks.loadtest --url http://127.0.0.1:8000   (an app that is already running)
+'''
+import os
+import re
+import sys
+import json
+import math
+import time
+import random
+import socket
+import argparse
+import tempfile
+import threading
+import subprocess
+import requests
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_DATABASE = os.path.join(tempfile.gettempdir(), 'execpeersite_loadtest.sqlite3')
+# route=weight pairs. Organization pages dominate real traffic, submissions are rare.
+DEFAULT_MIX = 'site=30,org=40,diagram=10,compare_api=10,query=8,query_submit=2'
+PERCENTILES = (('p50', 0.5), ('p95', 0.95), ('p99', 0.99))
+ORG_LINK_RE = re.compile(r'href="/orgs/(\d+)')
+
+
+def _site(rand, targets):
+    return 'GET', '/', {}
+
+
+def _org(rand, targets):
+    return 'GET', f'/orgs/{rand.choice(targets["org_ids"])}/', {}
+
+
+def _compared_ids(rand, targets):
+    org_ids = targets['org_ids']
+    return '/'.join(str(org_id) for org_id in rand.sample(org_ids, min(len(org_ids), rand.randint(2, 4))))
+
+
+def _diagram(rand, targets):
+    return 'GET', f'/compare/{_compared_ids(rand, targets)}/', {}
+
+
+def _compare_api(rand, targets):
+    return 'GET', f'/api/compare/{_compared_ids(rand, targets)}.json', {}
+
+
+def _query(rand, targets):
+    return 'GET', '/query/', {}
+
+
+def _query_submit(rand, targets):
+    return 'POST', '/query/', {'data': {'name': rand.choice(targets['query_names'])}}
+
+
+# route -> function of (random.Random, targets) returning (method, path, requests kwargs)
+ROUTES = {
+    'site': _site,
+    'org': _org,
+    'diagram': _diagram,
+    'compare_api': _compare_api,
+    'query': _query,
+    'query_submit': _query_submit,
+}
+
+
+def parse_mix(mix):
+    """
+    :param mix: comma separated route=weight pairs, i.e. site=3,org=7
+    :return: {route: weight}
+    """
+    weights = {}
+    for pair in mix.split(','):
+        route, _, weight = pair.partition('=')
+        route = route.strip()
+        if route not in ROUTES:
+            raise ValueError(f'Unknown route {route!r}, expected one of {", ".join(ROUTES)}')
+        try:
+            weights[route] = float(weight or 1)
+        except ValueError:
+            raise ValueError(f'Invalid weight for {route}: {weight!r}')
+    if not any(weights.values()):
+        raise ValueError('The mix must give a positive weight to at least one route')
+    return weights
+
+
+def percentile(values, fraction):
+    """
+    Nearest-rank percentile.
+    :param values: sorted list of numbers
+    :param fraction: between 0 and 1, i.e. 0.99
+    """
+    if not values:
+        return None
+    return values[max(0, math.ceil(fraction * len(values)) - 1)]
+
+
+def summarize(samples, elapsed):
+    """
+    :param samples: [(route, status or None on connection errors, seconds), ...]
+    :param elapsed: wall clock seconds of the run
+    :return: {route: {'requests': n, 'errors': n, 'throughput': requests per second, 'mean': s, 'max': s,
+                      'p50': s, 'p95': s, 'p99': s}} with every request under 'all'
+    """
+    by_route = {}
+    for route, status, seconds in samples:
+        for name in (route, 'all'):
+            by_route.setdefault(name, []).append((status, seconds))
+    summary = {}
+    for route, results in sorted(by_route.items(), key=lambda item: (item[0] == 'all', item[0])):
+        latencies = sorted(seconds for status, seconds in results)
+        summary[route] = {
+            'requests': len(results),
+            'errors': sum(1 for status, seconds in results if status is None or status >= 400),
+            'throughput': len(results) / elapsed if elapsed else 0,
+            'mean': sum(latencies) / len(latencies),
+            'max': latencies[-1],
+        }
+        summary[route].update((name, percentile(latencies, fraction)) for name, fraction in PERCENTILES)
+    return summary
+
+
+def run_load(base_url, targets, mix, concurrency=8, duration=30, requests_total=None, seed=0, timeout=30):
+    """
+    Send requests from concurrency threads, each waiting for its response before sending the next one.
+    :param base_url: app root, i.e. http://127.0.0.1:8000
+    :param targets: {'org_ids': [...], 'query_names': [...]} used to build the requests
+    :param mix: {route: weight}
+    :param duration: seconds to run, unless requests_total is given
+    :param requests_total: number of requests to send
+    :return: (samples, elapsed seconds) for summarize()
+    """
+    routes, weights = zip(*mix.items())
+    samples = []
+    lock = threading.Lock()
+    sent = [0]
+    start = time.perf_counter()
+    deadline = start + duration
+
+    def worker(index):
+        rand = random.Random(seed + index)
+        cookies = {}
+        if 'query_submit' in routes:
+            # CSRF cookie sent back with the form
+            cookies = requests.get(f'{base_url}/query/', timeout=timeout).cookies
+        while True:
+            with lock:
+                if requests_total is not None and sent[0] >= requests_total:
+                    return
+                sent[0] += 1
+            if requests_total is None and time.perf_counter() >= deadline:
+                return
+            route = rand.choices(routes, weights)[0]
+            method, path, kwargs = ROUTES[route](rand, targets)
+            if method == 'POST':
+                kwargs['headers'] = {'X-CSRFToken': cookies.get('csrftoken', '')}
+            request_start = time.perf_counter()
+            try:
+                # Every request opens its own connection, as gunicorn's sync workers close the connection
+                # after each response. Reused runserver connections also stall on delayed ACKs.
+                response = requests.request(method, f'{base_url}{path}', cookies=cookies, timeout=timeout,
+                                            allow_redirects=False, **kwargs)
+                status = response.status_code
+            except requests.RequestException:
+                status = None
+            seconds = time.perf_counter() - request_start
+            with lock:
+                samples.append((route, status, seconds))
+
+    threads = [threading.Thread(target=worker, args=(index,), daemon=True) for index in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples, time.perf_counter() - start
+
+
+def discover_targets(base_url, query_names=(), timeout=30):
+    """
+    :return: targets for run_load() with the organizations listed on the first page of the site
+    """
+    response = requests.get(f'{base_url}/', timeout=timeout)
+    response.raise_for_status()
+    org_ids = sorted({int(org_id) for org_id in ORG_LINK_RE.findall(response.text)})
+    if not org_ids:
+        raise RuntimeError(f'No organizations are listed on {base_url}/, seed the database first')
+    return {'org_ids': org_ids, 'query_names': list(query_names) or ['Load Test Network']}
+
+
+def seed_database(dataset, orgs):
+    """
+    Migrate the database given by SQLITE_PATH and store the first orgs networks of the dataset.
+    Organizations stored by an earlier run are kept.
+    """
+    import django
+    django.setup()
+    from django.core.management import call_command
+    from benchmarks.synthetic import FixtureBackend
+    from execsite.models import Organization
+    from execsite.services import persist_organization
+    from utilities.prdb_requests.prdb_req import Organization as prdb_org
+
+    call_command('migrate', verbosity=0)
+    backend = FixtureBackend(dataset)
+    for net in dataset['net'][:orgs]:
+        if not Organization.objects.filter(asn=net['asn']).exists():
+            org_class = prdb_org(asn=net['asn'], backend=backend)
+            org_class.peer_metrics()
+            persist_organization(org_class)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_app(server, port, env, workers=1, threads=1):
+    """
+    :param server: runserver (one threaded process) or gunicorn
+    :return: subprocess.Popen of the app
+    """
+    if server == 'gunicorn':
+        command = [sys.executable, '-m', 'gunicorn', 'execpeersite.wsgi', '--bind', f'127.0.0.1:{port}',
+                   '--workers', str(workers), '--threads', str(threads), '--log-level', 'warning']
+        stderr = None
+    else:
+        command = [sys.executable, 'manage.py', 'runserver', '--noreload', f'127.0.0.1:{port}']
+        # runserver logs every request
+        stderr = subprocess.DEVNULL
+    return subprocess.Popen(command, cwd=PROJECT_DIR, env=env, stdout=subprocess.DEVNULL, stderr=stderr)
+
+
+def wait_until_ready(base_url, process, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'The app exited with status {process.returncode}')
+        try:
+            if requests.get(f'{base_url}/', timeout=5).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f'The app did not answer on {base_url} within {timeout}s')
+
+
+def print_summary(summary):
+    print(f'{"route":<14} {"requests":>9} {"errors":>7} {"req/s":>8} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} '
+          f'{"max ms":>8}')
+    for route, stats in summary.items():
+        print(f'{route:<14} {stats["requests"]:>9} {stats["errors"]:>7} {stats["throughput"]:>8.1f} '
+              f'{stats["p50"] * 1000:>8.1f} {stats["p95"] * 1000:>8.1f} {stats["p99"] * 1000:>8.1f} '
+              f'{stats["max"] * 1000:>8.1f}')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='Load test a running app instead of starting one.')
+    parser.add_argument('--server', choices=('runserver', 'gunicorn'), default='runserver')
+    parser.add_argument('--workers', type=int, default=4, help='gunicorn worker processes.')
+    parser.add_argument('--threads', type=int, default=1, help='Threads per gunicorn worker.')
+    parser.add_argument('--database', default=DEFAULT_DATABASE, help='SQLite database to seed and serve.')
+    parser.add_argument('--fresh', action='store_true', help='Delete the database before seeding it.')
+    parser.add_argument('--orgs', type=int, default=20, help='Organizations stored in the database.')
+    parser.add_argument('--records', type=int, default=1000, help='Netixlan records of each organization.')
+    parser.add_argument('--latency', help='PeeringDB stub latency distribution, see benchmarks.peeringdb_stub.')
+    parser.add_argument('--ingest-worker', action='store_true',
+                        help='Run ingest_worker so that submitted queries are ingested from the stub.')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f'route=weight pairs of {", ".join(ROUTES)}.')
+    parser.add_argument('--concurrency', type=int, default=8, help='Requests in flight.')
+    parser.add_argument('--duration', type=float, default=30, help='Seconds to run.')
+    parser.add_argument('--requests', type=int, help='Number of requests to send instead of running for --duration.')
+    parser.add_argument('--timeout', type=float, default=30, help='Seconds to wait for a response.')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Write the summary to this JSON file.')
+    args = parser.parse_args(argv)
+    try:
+        mix = parse_mix(args.mix)
+    except ValueError as exc:
+        parser.error(str(exc))
+
+    # Networks after the seeded ones exist only in the stub, so submitting them queues an ingestion.
+    query_names = [f'Synthetic Network {net_id}' for net_id in range(args.orgs + 1, args.orgs * 2 + 1)]
+    processes, stub_server = [], None
+    try:
+        if args.url:
+            base_url = args.url.rstrip('/')
+        else:
+            from benchmarks.synthetic import synthetic_networks
+            from benchmarks.peeringdb_stub import PeeringDBStub, StubServer
+
+            if args.fresh and os.path.exists(args.database):
+                os.remove(args.database)
+            os.environ['SQLITE_PATH'] = args.database
+            os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'execpeersite.settings')
+            dataset = synthetic_networks(args.orgs * 2, args.records)
+            print(f'Seeding {args.orgs} organizations into {args.database}')
+            seed_database(dataset, args.orgs)
+            stub_server = StubServer(PeeringDBStub(dataset, latency=args.latency, seed=args.seed)).start()
+            env = dict(os.environ, PEERING_DB_URL=stub_server.url)
+            port = free_port()
+            base_url = f'http://127.0.0.1:{port}'
+            processes.append(start_app(args.server, port, env, args.workers, args.threads))
+            if args.ingest_worker:
+                processes.append(subprocess.Popen([sys.executable, 'manage.py', 'ingest_worker'], cwd=PROJECT_DIR,
+                                                  env=env, stdout=subprocess.DEVNULL))
+            wait_until_ready(base_url, processes[0])
+        targets = discover_targets(base_url, query_names, args.timeout)
+
+        print(f'Running {args.requests or f"{args.duration:g}s of"} requests against {base_url} '
+              f'({args.server if not args.url else "external"}) with concurrency {args.concurrency}')
+        samples, elapsed = run_load(base_url, targets, mix, args.concurrency, args.duration, args.requests,
+                                    args.seed, args.timeout)
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
+        if stub_server:
+            stub_server.shutdown()
+            stub_server.server_close()
+
+    summary = summarize(samples, elapsed)
+    print_summary(summary)
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump({'config': {key: value for key, value in vars(args).items() if key != 'output'},
+                       'elapsed': elapsed, 'routes': summary}, output, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
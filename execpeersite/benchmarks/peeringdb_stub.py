@@ -0,0 +1,236 @@
+'''
+
+Local stand-in for the PeeringDB API serving recorded or synthetic data, with injected latency,
+errors and rate limiting. Point PEERING_DB_URL at it to exercise the client and ingestion offline.
+
+Usage: python -m benchmarks.peeringdb_stub [--records 10000] [--latency lognormal:0.08,0.5] [--rate-limit 20]
+       PEERING_DB_URL=http://127.0.0.1:8081/api python manage.py ingest_worker
+'''
+import sys
+import json
+import signal
+import math
+import time
+import random
+import argparse
+import threading
+from urllib.parse import urlsplit, parse_qsl
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from socketserver import ThreadingMixIn
+from benchmarks.fixtures import RECORDINGS, recorded_network
+from benchmarks.synthetic import synthetic_networks, FixtureBackend
+
+API_ROOT = '/api'
+# Bytes written at a time when the bandwidth is limited.
+WRITE_CHUNK_SIZE = 16 * 1024
+
+
+def latency_distribution(spec):
+    """
+    :param spec: fixed:seconds (or just seconds), uniform:low,high, normal:mean,stddev,
+                 lognormal:median,sigma or exponential:mean
+    :return: function of a random.Random returning seconds, never negative
+    """
+    name, _, args = spec.partition(':') if ':' in spec else ('fixed', '', spec)
+    try:
+        args = [float(arg) for arg in args.split(',')]
+        distribution = {
+            'fixed': lambda rand, seconds: seconds,
+            'uniform': lambda rand, low, high: rand.uniform(low, high),
+            'normal': lambda rand, mean, stddev: rand.gauss(mean, stddev),
+            'lognormal': lambda rand, median, sigma: rand.lognormvariate(math.log(median), sigma),
+            'exponential': lambda rand, mean: rand.expovariate(1 / mean),
+        }[name]
+        distribution(random.Random(), *args)
+    except (KeyError, TypeError, ValueError, ZeroDivisionError):
+        raise ValueError(f'Invalid latency distribution: {spec}')
+    return lambda rand: max(0.0, distribution(rand, *args))
+
+
+class TokenBucket:
+    """
+    Allows rate requests per second on average and bursts of up to burst requests.
+    """
+
+    def __init__(self, rate, burst=None, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst or max(1, rate)
+        self.clock = clock
+        self.tokens = self.burst
+        self.updated = clock()
+
+    def take(self):
+        """
+        :return: 0 when the request is allowed, otherwise seconds until it would be
+        """
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0
+        return (1 - self.tokens) / self.rate
+
+
+class PeeringDBStub:
+
+    def __init__(self, dataset, latency=None, error_rate=0.0, error_status=503, rate_limit=None, burst=None,
+                 bandwidth=None, seed=0, sleep=time.sleep, clock=time.monotonic):
+        """
+        :param dataset: PeeringDB objects, i.e. synthetic_network() or recorded_network()
+        :param latency: latency_distribution() spec applied to every response, None to answer at once
+        :param error_rate: fraction of requests answered with error_status
+        :param error_status: HTTP status of injected errors
+        :param rate_limit: requests per second allowed, None for no limit. Excess requests get a 429 with Retry-After.
+        :param burst: requests allowed at once by the rate limit. Defaults to rate_limit.
+        :param bandwidth: bytes per second at which response bodies are written, None for no limit
+        :param seed: random seed of the latency and error injection
+        :param sleep: function used to wait
+        :param clock: monotonic clock of the rate limit
+        """
+        self.backend = FixtureBackend(dataset)
+        self.latency = latency_distribution(latency) if latency else None
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.bucket = TokenBucket(rate_limit, burst, clock) if rate_limit else None
+        self.bandwidth = bandwidth
+        self.sleep = sleep
+        self.stats = {}
+        self._rand = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def handle(self, path, params):
+        """
+        :param path: URL path, i.e. /api/net/1956
+        :param params: query parameters
+        :return: (status, headers, body bytes)
+        """
+        with self._lock:
+            delay = self.latency(self._rand) if self.latency else 0
+            error = self.error_rate and self._rand.random() < self.error_rate
+            wait = self.bucket.take() if self.bucket else 0
+        if delay:
+            self.sleep(delay)
+        if wait:
+            status, headers = 429, {'Retry-After': str(math.ceil(wait))}
+            document = {'message': 'Request was throttled.'}
+        elif error:
+            status, headers, document = self.error_status, {}, {'meta': {'error': 'Injected error'}}
+        else:
+            status, headers, document = self.document(path, params)
+        with self._lock:
+            self.stats[status] = self.stats.get(status, 0) + 1
+        body = json.dumps(document).encode()
+        headers.update({'Content-Type': 'application/json', 'Content-Length': str(len(body))})
+        return status, headers, body
+
+    def document(self, path, params):
+        """
+        :return: (status, headers, API document) answered from the dataset
+        """
+        if not path.startswith(f'{API_ROOT}/'):
+            return 404, {}, {'meta': {'error': 'Not found'}}
+        try:
+            document = self.backend.get(path[len(API_ROOT):], **params)
+        except (AttributeError, KeyError, ValueError):
+            return 404, {}, {'meta': {'error': 'Not found'}}
+        if not document['data'] and path.rstrip('/').rsplit('/', 1)[-1].isdigit():
+            return 404, {}, {'meta': {'error': 'Entity not found'}}
+        return 200, {}, document
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        stub = self.server.stub
+        status, headers, body = stub.handle(url.path, dict(parse_qsl(url.query)))
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        chunk_size = WRITE_CHUNK_SIZE if stub.bandwidth else len(body) or 1
+        for offset in range(0, len(body), chunk_size):
+            self.wfile.write(body[offset:offset + chunk_size])
+            if stub.bandwidth:
+                stub.sleep(chunk_size / stub.bandwidth)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class StubServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+    def __init__(self, stub, host='127.0.0.1', port=0, verbose=False):
+        """
+        :param stub: PeeringDBStub answering the requests
+        :param port: port to listen on, 0 for any free port
+        """
+        super().__init__((host, port), _Handler)
+        self.stub = stub
+        self.verbose = verbose
+
+    @property
+    def url(self):
+        """
+        :return: value for PEERING_DB_URL
+        """
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}{API_ROOT}'
+
+    def start(self):
+        """
+        Serve from a daemon thread, i.e. within a benchmark or a test. Stop with shutdown().
+        """
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    data = parser.add_mutually_exclusive_group()
+    data.add_argument('--recording', choices=RECORDINGS, default=RECORDINGS[0],
+                      help='Serve a recorded network (default).')
+    data.add_argument('--records', type=int, help='Serve synthetic networks with this many netixlan records each.')
+    parser.add_argument('--networks', type=int, default=1, help='Number of synthetic networks.')
+    parser.add_argument('--latency', help='Latency distribution, i.e. 0.05, uniform:0.02,0.2, normal:0.1,0.03, '
+                                          'lognormal:0.08,0.5 or exponential:0.1 (seconds).')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests that fail.')
+    parser.add_argument('--error-status', type=int, default=503, help='HTTP status of failed requests.')
+    parser.add_argument('--rate-limit', type=float, help='Requests per second before answering 429.')
+    parser.add_argument('--burst', type=int, help='Requests allowed at once. Defaults to the rate limit.')
+    parser.add_argument('--bandwidth', type=float, help='Bytes per second of response bodies.')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--verbose', action='store_true', help='Log every request.')
+    args = parser.parse_args(argv)
+
+    if args.records:
+        dataset = synthetic_networks(args.networks, args.records)
+    else:
+        dataset = recorded_network(args.recording)
+    try:
+        stub = PeeringDBStub(dataset, args.latency, args.error_rate, args.error_status, args.rate_limit, args.burst,
+                             args.bandwidth, args.seed)
+    except ValueError as exc:
+        parser.error(str(exc))
+    server = StubServer(stub, args.host, args.port, args.verbose)
+    print(f'Serving {len(dataset["net"])} networks and {len(dataset["netixlan"])} netixlan records. '
+          f'PEERING_DB_URL={server.url}')
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f'Responses by status: {dict(sorted(stub.stats.items()))}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
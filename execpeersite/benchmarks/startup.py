@@ -0,0 +1,112 @@
+'''
+
+Cold start budget: time and peak RSS of loading the app in a fresh interpreter, as a gunicorn worker or a
+manage.py command does, and heavy modules that must only be imported on first use.
+
+Usage: python -m benchmarks.startup [--runs 5] [--update]
+'''
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BUDGET_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'startup_budget.json')
+# Budgets written by --update leave this much room over the measured medians.
+HEADROOM = 1.5
+# What each probe loads: the WSGI app, or Django with the system checks run by most commands.
+PROBES = {
+    'wsgi': 'from execpeersite.wsgi import application',
+    'manage': 'import django; django.setup(); from django.core.management import call_command; '
+              'call_command("check", verbosity=0)',
+}
+PROBE = '''
+import os, sys, json, time, resource
+start = time.perf_counter()
+{code}
+seconds = time.perf_counter() - start
+rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+heavy = {heavy!r}
+print(json.dumps({{
+    'seconds': seconds,
+    'rss_mb': rss / (1024 * 1024 if sys.platform == 'darwin' else 1024),
+    'modules': sorted(name for name in sys.modules if name.split('.')[0] in heavy),
+}}))
+'''
+
+
+def load_budget(path=BUDGET_PATH):
+    with open(path) as budget:
+        return json.load(budget)
+
+
+def measure(probe, heavy_modules, runs=1):
+    """
+    Load the app in fresh interpreters. PeeringDB credentials are removed from their environment,
+    as they must only be needed once PeeringDB is queried.
+    :param probe: name from PROBES
+    :param heavy_modules: top level packages reported when they are imported
+    :param runs: interpreters started, the median time and RSS are reported
+    :return: {'seconds': s, 'rss_mb': n, 'modules': [heavy modules imported]}
+    """
+    env = {key: value for key, value in os.environ.items() if key not in ('PEERING_DB_USER', 'PEERING_DB_PASS')}
+    env.setdefault('DJANGO_SETTINGS_MODULE', 'execpeersite.settings')
+    code = PROBE.format(code=PROBES[probe], heavy=sorted(heavy_modules))
+    results = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', code], cwd=PROJECT_DIR, env=env, check=True,
+                                stdout=subprocess.PIPE, universal_newlines=True).stdout
+        results.append(json.loads(output.splitlines()[-1]))
+    return {
+        'seconds': statistics.median(result['seconds'] for result in results),
+        'rss_mb': statistics.median(result['rss_mb'] for result in results),
+        'modules': sorted({module for result in results for module in result['modules']}),
+    }
+
+
+def over_budget(probe, result, budget):
+    """
+    :return: list of messages, empty when the probe is within its budget
+    """
+    limits = budget['probes'][probe]
+    problems = [f'{probe}: {key} {result[key]:.3g} exceeds the budget of {limits[key]:.3g}'
+                for key in ('seconds', 'rss_mb') if result[key] > limits[key]]
+    if result['modules']:
+        problems.append(f'{probe}: imports {", ".join(result["modules"])} at startup')
+    return problems
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5, help='Interpreters started per probe.')
+    parser.add_argument('--budget', default=BUDGET_PATH)
+    parser.add_argument('--update', action='store_true',
+                        help=f'Write the measurements times {HEADROOM} as the new budget.')
+    args = parser.parse_args(argv)
+
+    budget = load_budget(args.budget)
+    results = {probe: measure(probe, budget['heavy_modules'], args.runs) for probe in PROBES}
+    print(f'{"probe":<8} {"seconds":>8} {"budget":>8} {"rss MB":>8} {"budget":>8}')
+    for probe, result in results.items():
+        limits = budget['probes'].get(probe, {'seconds': float('nan'), 'rss_mb': float('nan')})
+        print(f'{probe:<8} {result["seconds"]:>8.3f} {limits["seconds"]:>8.3f} {result["rss_mb"]:>8.1f} '
+              f'{limits["rss_mb"]:>8.1f}')
+    if args.update:
+        budget['probes'] = {probe: {'seconds': round(result['seconds'] * HEADROOM, 3),
+                                    'rss_mb': round(result['rss_mb'] * HEADROOM)}
+                            for probe, result in results.items()}
+        with open(args.budget, 'w') as budget_file:
+            json.dump(budget, budget_file, indent=2)
+            budget_file.write('\n')
+        print(f'Budget written to {args.budget}')
+        return 0
+    problems = [problem for probe, result in results.items() for problem in over_budget(probe, result, budget)]
+    for problem in problems:
+        print(problem)
+    return 1 if problems else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
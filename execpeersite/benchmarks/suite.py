@@ -0,0 +1,183 @@
+'''
+
+Offline benchmark suite: ingestion, persistence and diagram rendering on recorded and synthetic PeeringDB data.
+Results are written as JSON and can be compared against a saved baseline.
+
+Usage: python -m benchmarks.suite [--sizes 10 1000] [--output results.json] [--baseline baseline.json]
+'''
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+from datetime import datetime, timezone
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'execpeersite.settings')
+
+SIZES = (10, 100, 1000, 10000, 100000)
+# (organizations, exchanges per organization, distinct exchanges) of the compared organizations.
+SANKEY_CASES = ((2, 10, 20), (2, 100, 200), (2, 1000, 2000), (10, 1000, 2000))
+BENCHMARKS = ('peer_organization', 'peer_metrics', 'persist_organization', 'sankey_diagram')
+# A benchmark regresses when it is slower than its baseline by more than this fraction ...
+TOLERANCE = 0.25
+# ... and by more than this many seconds, so timer noise on tiny cases is ignored.
+NOISE_FLOOR = 0.001
+
+
+def timed(function, repeat, setup=None):
+    """
+    :param function: called without arguments, with the result of setup() when setup is given
+    :param repeat: number of runs
+    :param setup: called before each run, outside of the timing
+    :return: seconds of the fastest run
+    """
+    timings = []
+    for _ in range(repeat):
+        args = (setup(),) if setup else ()
+        start = time.perf_counter()
+        function(*args)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def bench_network(dataset, repeat, benchmarks):
+    """
+    Time the ingestion path of query_view and the ingest worker on one network.
+    :param dataset: PeeringDB objects served by FixtureBackend
+    :return: {benchmark: seconds}
+    """
+    from django.db import transaction
+    from benchmarks.synthetic import FixtureBackend
+    from execsite.services import persist_organization
+    from utilities.prdb_requests.prdb_req import Organization
+
+    org_class = Organization(dataset['net'][0]['name'], backend=FixtureBackend(dataset))
+    results = {}
+    if 'peer_organization' in benchmarks:
+        results['peer_organization'] = timed(org_class.PeerOrganization, repeat)
+    org_class.peer_info = org_class.PeerOrganization()
+    if 'peer_metrics' in benchmarks:
+        results['peer_metrics'] = timed(org_class.peer_metrics, repeat)
+    org_class.peer_metrics()
+    if 'persist_organization' in benchmarks:
+        def persist():
+            with transaction.atomic():
+                persist_organization(org_class)
+                transaction.set_rollback(True)
+        results['persist_organization'] = timed(persist, repeat)
+    return results
+
+
+def run_suite(sizes=SIZES, repeat=3, benchmarks=BENCHMARKS, progress=None):
+    """
+    Run the benchmarks on the recorded fixtures and on synthetic networks of each size.
+    Persistence is measured against a test database created for the run.
+    :param sizes: netixlan records of the synthetic networks
+    :param repeat: runs per case, the fastest is reported
+    :param benchmarks: names from BENCHMARKS to run
+    :param progress: called with (name, result) as each case completes
+    :return: {'meta': {...}, 'results': {'benchmark[case]': {'records': n, 'seconds': s}}}
+    """
+    import django
+    django.setup()
+    from django.db import connection
+    from django.test.utils import setup_test_environment, teardown_test_environment
+    from benchmarks.fixtures import RECORDINGS, recorded_network
+    from benchmarks.synthetic import synthetic_network
+    from benchmarks.bench_sankey import synthetic_comparison
+
+    results = {}
+
+    def record(benchmark, case, records, seconds):
+        name = f'{benchmark}[{case}]'
+        results[name] = {'records': records, 'seconds': seconds}
+        if progress:
+            progress(name, results[name])
+
+    networks = [(recording, recorded_network(recording)) for recording in RECORDINGS]
+    networks += [(f'synthetic-{records}', synthetic_network(records)) for records in sizes]
+    if set(benchmarks) - {'sankey_diagram'}:
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0)
+        try:
+            for case, dataset in networks:
+                for benchmark, seconds in bench_network(dataset, repeat, benchmarks).items():
+                    record(benchmark, case, len(dataset['netixlan']), seconds)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+    if 'sankey_diagram' in benchmarks:
+        from utilities.execsite_graphs.es_graphs import sankey_diagram
+        for orgs, exchanges_per_org, exchanges in SANKEY_CASES:
+            org_conn_records = synthetic_comparison(orgs, exchanges_per_org, exchanges)
+            record('sankey_diagram', f'{orgs}x{exchanges_per_org}', orgs * exchanges_per_org,
+                   timed(lambda: sankey_diagram(org_conn_records), repeat))
+
+    return {
+        'meta': {
+            'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'repeat': repeat,
+        },
+        'results': results,
+    }
+
+
+def compare(results, baseline, tolerance=TOLERANCE, noise_floor=NOISE_FLOOR):
+    """
+    :param results: run_suite() output
+    :param baseline: run_suite() output saved from an earlier run
+    :return: [(name, baseline seconds, seconds), ...] of the cases slower than the baseline.
+             Cases missing from either run are ignored.
+    """
+    regressions = []
+    for name, result in sorted(results['results'].items()):
+        expected = baseline['results'].get(name)
+        if expected is None:
+            continue
+        seconds, baseline_seconds = result['seconds'], expected['seconds']
+        if seconds > baseline_seconds * (1 + tolerance) and seconds - baseline_seconds > noise_floor:
+            regressions.append((name, baseline_seconds, seconds))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES,
+                        help='Netixlan records of the synthetic networks.')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per case, the fastest is reported.')
+    parser.add_argument('--benchmarks', nargs='+', choices=BENCHMARKS, default=BENCHMARKS)
+    parser.add_argument('--output', help='Write the results to this JSON file.')
+    parser.add_argument('--baseline', help='Results of an earlier run to compare against.')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE,
+                        help='Slowdown, as a fraction of the baseline, reported as a regression.')
+    args = parser.parse_args(argv)
+
+    print(f'{"benchmark":<44} {"records":>8} {"seconds":>10} {"us/record":>10}')
+
+    def progress(name, result):
+        print(f'{name:<44} {result["records"]:>8} {result["seconds"]:>10.4f} '
+              f'{result["seconds"] / max(result["records"], 1) * 1e6:>10.2f}')
+
+    results = run_suite(args.sizes, args.repeat, args.benchmarks, progress)
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2, sort_keys=True)
+    if args.baseline:
+        with open(args.baseline) as baseline:
+            regressions = compare(results, json.load(baseline), args.tolerance)
+        for name, baseline_seconds, seconds in regressions:
+            print(f'REGRESSION {name}: {baseline_seconds:.4f}s -> {seconds:.4f}s '
+                  f'({seconds / baseline_seconds - 1:+.0%})')
+        if regressions:
+            return 1
+        print('No regressions against the baseline')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,88 @@
+'''
+
+Synthetic PeeringDB data for benchmarks, served through an in-memory prdb_req backend
+'''
+import re
+import random
+
+SPEEDS = (1000, 10000, 10000, 100000)
+
+
+def synthetic_network(records, exchanges=None, ix_orgs=None, net_id=1, seed=0):
+    """
+    Build PeeringDB objects for a single network present on many exchanges.
+    :param records: number of netixlan records of the network
+    :param exchanges: number of distinct exchanges. Defaults to one per 20 records.
+    :param ix_orgs: number of organizations operating the exchanges. Defaults to one per 4 exchanges.
+    :param net_id: PeeringDB id of the network, its asn is 64512 + net_id
+    :param seed: random seed, the same arguments always build the same data
+    :return: {'org': [...], 'ix': [...], 'net': [...], 'netixlan': [...]} lists of API objects
+    """
+    rand = random.Random(seed)
+    exchanges = exchanges or max(1, records // 20)
+    ix_orgs = ix_orgs or max(1, exchanges // 4)
+    orgs = [{'id': org_id, 'name': f'Exchange Operator {org_id}', 'status': 'ok'}
+            for org_id in range(1, ix_orgs + 1)]
+    ixs = [{'id': ix_id, 'org_id': rand.randint(1, ix_orgs), 'name': f'Exchange {ix_id}', 'status': 'ok'}
+           for ix_id in range(1, exchanges + 1)]
+    netixlans = []
+    for netixlan_id in range(1, records + 1):
+        ix = rand.choice(ixs)
+        netixlans.append({'id': netixlan_id, 'net_id': net_id, 'ix_id': ix['id'], 'name': ix['name'],
+                          'speed': rand.choice(SPEEDS), 'asn': 64512 + net_id, 'status': 'ok'})
+    nets = [{'id': net_id, 'org_id': ix_orgs + 1, 'name': f'Synthetic Network {net_id}', 'asn': 64512 + net_id,
+             'status': 'ok'}]
+    return {'org': orgs, 'ix': ixs, 'net': nets, 'netixlan': netixlans}
+
+
+def synthetic_networks(count, records=40):
+    """
+    :return: PeeringDB objects of count synthetic networks that share their exchanges
+    """
+    dataset = synthetic_network(records, net_id=1)
+    for net_id in range(2, count + 1):
+        network = synthetic_network(records, net_id=net_id)
+        dataset['net'] += network['net']
+        dataset['netixlan'] += network['netixlan']
+    return dataset
+
+
+class FixtureBackend:
+    """
+    Answers the PeeringDB API paths used by prdb_req.Organization from in-memory objects.
+    """
+    path_re = re.compile(r'^/(?P<resource>\w+?)(?:/(?P<id>\d+))?/?$')
+    concurrent = False
+
+    def __init__(self, dataset):
+        self.objects = {resource: {obj['id']: obj for obj in objects} for resource, objects in dataset.items()}
+        self.netixlan_sets = {}
+        for netixlan in dataset.get('netixlan', []):
+            self.netixlan_sets.setdefault(netixlan['net_id'], []).append(netixlan)
+        self.ix_sets = {}
+        for ix in dataset.get('ix', []):
+            self.ix_sets.setdefault(ix['org_id'], []).append(ix['id'])
+
+    def get(self, path, **params):
+        match = self.path_re.match(path)
+        resource, object_id = match.group('resource'), match.group('id')
+        objects = self.objects[resource]
+        if object_id:
+            data = [objects[int(object_id)]] if int(object_id) in objects else []
+        elif resource == 'netixlan' and 'net_id' in params:
+            data = list(self.netixlan_sets.get(int(params['net_id']), []))
+        elif 'id__in' in params:
+            data = [objects[int(i)] for i in str(params['id__in']).split(',') if int(i) in objects]
+        else:
+            data = list(objects.values())
+        for key, value in params.items():
+            if key.endswith('__contains'):
+                field = key[:-len('__contains')]
+                data = [obj for obj in data if str(value).lower() in str(obj.get(field, '')).lower()]
+            elif key in ('asn', 'net_id', 'ix_id', 'org_id'):
+                data = [obj for obj in data if obj.get(key) == int(value)]
+        if resource == 'net' and object_id:
+            data = [dict(obj, netixlan_set=self.netixlan_sets.get(obj['id'], [])) for obj in data]
+        elif resource == 'org' and int(params.get('depth', 0)):
+            data = [dict(obj, ix_set=self.ix_sets.get(obj['id'], [])) for obj in data]
+        return {'meta': {}, 'data': data}
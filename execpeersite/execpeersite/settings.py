@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/2.1/ref/settings/
 """
 
 import os
+import tempfile
 import django_heroku
 import dj_database_url
 from decouple import config
@@ -43,10 +44,11 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'django.contrib.humanize',
     'mathfilters',
-    'execsite'
+    'execsite.apps.ExecsiteConfig'
 ]
 
 MIDDLEWARE = [
+    'execsite.middleware.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -83,13 +85,39 @@ WSGI_APPLICATION = 'execpeersite.wsgi.application'
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        # Overridden by benchmarks/loadtest.py to run against a seeded database.
+        'NAME': config('SQLITE_PATH', default=os.path.join(BASE_DIR, 'db.sqlite3')),
     }
 }
 # django_heroku.settings(locals())
 # DATABASES = {}
 # DATABASES['default'] = dj_database_url.config(conn_max_age=600, ssl_require=True)
 
+# Comparison diagram specs are cached by organization data version. A file or database cache
+# is shared by every gunicorn worker on the host.
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': config('CACHE_LOCATION', default=os.path.join(tempfile.gettempdir(), 'execpeersite_cache')),
+        'TIMEOUT': 7 * 24 * 60 * 60,
+        'OPTIONS': {
+            'MAX_ENTRIES': 1000,
+        },
+    }
+}
+
+# PeeringDB data source for ingestion: 'api' queries peeringdb.com, 'mirror' reads the local
+# tables loaded by `manage.py prdb_mirror`.
+PEERING_DB_BACKEND = config('PEERING_DB_BACKEND', default='api')
+
+# Seconds after which a running ingestion job that stopped reporting progress is considered abandoned
+# by its worker and queued again.
+INGEST_JOB_TIMEOUT = config('INGEST_JOB_TIMEOUT', default=15 * 60, cast=int)
+
+# Per-request database, PeeringDB and template timings, sent as a Server-Timing header and
+# aggregated per worker process on /metrics. The middleware unloads itself when disabled.
+PERFORMANCE_METRICS = config('PERFORMANCE_METRICS', default=False, cast=bool)
+
 # Password validation
 # https://docs.djangoproject.com/en/2.1/ref/settings/#auth-password-validators
 
@@ -8,9 +8,19 @@ https://docs.djangoproject.com/en/2.1/howto/deployment/wsgi/
 """
 
 import os
+from importlib import import_module
 
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'execpeersite.settings')
 
 application = get_wsgi_application()
+
+# Load the URLconf, views and template engines now rather than on the first request. With gunicorn --preload
+# this happens once in the master and the forked workers share the loaded modules copy-on-write.
+# Database connections and the PeeringDB client are opened lazily by each worker.
+from django.conf import settings  # noqa: E402
+from django.template import engines  # noqa: E402
+
+import_module(settings.ROOT_URLCONF)
+engines.all()
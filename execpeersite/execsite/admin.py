@@ -1,8 +1,9 @@
 from django.contrib import admin
-from execsite.models import Organization, PeerOrganization, Connectivity
+from execsite.models import Organization, PeerOrganization, Connectivity, Exchange
 
 
 # Register your models here.
 admin.site.register(Organization)
 admin.site.register(PeerOrganization)
-admin.site.register(Connectivity)
\ No newline at end of file
+admin.site.register(Connectivity)
+admin.site.register(Exchange)
\ No newline at end of file
@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class ExecsiteConfig(AppConfig):
     name = 'execsite'
+
+    def ready(self):
+        # Connects the signal receivers that maintain the exchange summaries.
+        from execsite import services  # noqa: F401
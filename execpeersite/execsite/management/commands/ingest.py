@@ -0,0 +1,45 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from execsite.services import INGEST_WORKERS, IngestCheckpoint, bulk_ingest
+
+
+class Command(BaseCommand):
+    help = ('Ingest the networks listed in a file, one name or ASN (46489 or AS46489) per line. '
+            'Completed entries are recorded in a checkpoint file and skipped when the command is run again.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('file', help='File of network names or ASNs. Blank lines and lines starting with # '
+                                         'are ignored.')
+        parser.add_argument('--workers', type=int, default=INGEST_WORKERS,
+                            help='Networks fetched from PeeringDB concurrently.')
+        parser.add_argument('--checkpoint', help='Checkpoint file. Defaults to <file>.checkpoint')
+        parser.add_argument('--restart', action='store_true', help='Discard the checkpoint and start over.')
+
+    def handle(self, *args, **options):
+        try:
+            with open(options['file']) as entry_file:
+                entries = list(dict.fromkeys(line.strip() for line in entry_file
+                                             if line.strip() and not line.lstrip().startswith('#')))
+        except OSError as exc:
+            raise CommandError(f'Cannot read {options["file"]}: {exc}')
+        checkpoint = IngestCheckpoint(options['checkpoint'] or f'{options["file"]}.checkpoint')
+        if options['restart']:
+            checkpoint.clear()
+        total = len(entries)
+        started = time.monotonic()
+        processed = []
+
+        def report(entry, status, error):
+            processed.append(status)
+            elapsed = time.monotonic() - started
+            rate = len(processed) / elapsed * 60 if elapsed else 0
+            self.stdout.write(f'[{len(processed)}/{total}] {entry}: {status} {error or ""}'.rstrip()
+                              + f' ({rate:.1f} networks/min)')
+
+        counts = bulk_ingest(entries, workers=options['workers'], checkpoint=checkpoint, progress=report)
+        elapsed = time.monotonic() - started
+        self.stdout.write(f'{counts["created"]} created, {counts["exists"]} already stored, '
+                          f'{counts["failed"]} failed, {counts["skipped"]} skipped from checkpoint '
+                          f'in {elapsed:.1f}s')
+        if counts['failed']:
+            self.stdout.write('Run the command again to retry failed entries.')
@@ -0,0 +1,26 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from execsite.services import claim_next_job, run_ingest_job
+
+
+class Command(BaseCommand):
+    help = 'Process queued organization ingestion jobs.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Exit once the queue is empty.')
+        parser.add_argument('--poll-interval', type=float, default=2, help='Seconds to wait when the queue is empty.')
+
+    def handle(self, *args, **options):
+        while True:
+            # Drop connections that outlived CONN_MAX_AGE or broke while the worker was idle.
+            close_old_connections()
+            job = claim_next_job()
+            if job is None:
+                if options['once']:
+                    return
+                time.sleep(options['poll_interval'])
+                continue
+            self.stdout.write(f'{job.name}: started job {job.id}')
+            job = run_ingest_job(job)
+            self.stdout.write(f'{job.name}: {job.status} {job.error}'.rstrip())
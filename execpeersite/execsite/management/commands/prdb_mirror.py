@@ -0,0 +1,48 @@
+import json
+import time
+from django.core.management.base import BaseCommand, CommandError
+from execsite.mirror import MIRROR_MODELS, load_snapshot, sync_changes
+from execsite.models import MirrorSync
+from utilities.prdb_requests.prdb_req import get_client
+
+
+class Command(BaseCommand):
+    help = ('Load PeeringDB org, ix, net and netixlan objects into the local mirror. '
+            'Without options a full snapshot is fetched from the API.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', help='JSON dump of the form {"ix": {"data": [...]}, "net": {"data": [...]}, ...}')
+        parser.add_argument('--sync', action='store_true',
+                            help='Fetch only objects changed since the last snapshot or sync.')
+        parser.add_argument('--resource', action='append', choices=list(MIRROR_MODELS),
+                            help='Limit to the given resource. May be repeated.')
+
+    def handle(self, *args, **options):
+        resources = options['resource'] or list(MIRROR_MODELS)
+        if options['file'] and options['sync']:
+            raise CommandError('--file and --sync cannot be combined.')
+        if options['file']:
+            with open(options['file']) as dump_file:
+                dump = json.load(dump_file)
+            for resource in resources:
+                if resource not in dump:
+                    self.stderr.write(f'{resource}: not present in {options["file"]}, skipped')
+                    continue
+                generated = dump[resource].get('meta', {}).get('generated')
+                loaded = load_snapshot(resource, dump[resource]['data'], int(generated) if generated else None)
+                self.stdout.write(f'{resource}: loaded {loaded} objects')
+        elif options['sync']:
+            last_sync = dict(MirrorSync.objects.filter(resource__in=resources).values_list('resource', 'last_sync'))
+            for resource in resources:
+                if resource not in last_sync:
+                    raise CommandError(f'{resource}: no snapshot loaded yet, run without --sync first.')
+                started = int(time.time())
+                objects = get_client().stream(f'/{resource}', since=last_sync[resource], depth=0)
+                written, deleted = sync_changes(resource, objects, started)
+                self.stdout.write(f'{resource}: {written} objects updated, {deleted} deleted')
+        else:
+            for resource in resources:
+                started = int(time.time())
+                objects = get_client().stream(f'/{resource}', depth=0)
+                loaded = load_snapshot(resource, objects, started)
+                self.stdout.write(f'{resource}: loaded {loaded} objects')
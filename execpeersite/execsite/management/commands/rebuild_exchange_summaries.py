@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from execsite.services import rebuild_exchange_summaries
+
+
+class Command(BaseCommand):
+    help = ('Recompute the exchange summaries from the stored connections. '
+            'Only needed after connections are changed outside the ingestion services, i.e. with raw SQL.')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'{rebuild_exchange_summaries()} exchange summaries rebuilt')
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+from execsite.models import Organization
+from execsite.services import refresh_organization
+
+
+class Command(BaseCommand):
+    help = ('Re-fetch stored organizations from PeeringDB and update only the connections that changed. '
+            'Run with --all for a nightly refresh.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('org_ids', nargs='*', type=int, help='Organization ids to refresh.')
+        parser.add_argument('--all', action='store_true', help='Refresh every stored organization.')
+
+    def handle(self, *args, **options):
+        if options['all'] == bool(options['org_ids']):
+            raise CommandError('Give organization ids or --all.')
+        org_records = Organization.objects.order_by('id')
+        if not options['all']:
+            org_records = org_records.filter(id__in=options['org_ids'])
+            missing = set(options['org_ids']) - set(org_records.values_list('id', flat=True))
+            if missing:
+                raise CommandError(f'Unknown organization ids: {sorted(missing)}')
+        failed = 0
+        # Ids are read up front: refreshing writes to the organization table, which SQLite does not
+        # reliably allow while a cursor over it is open.
+        for org_id in list(org_records.values_list('id', flat=True)):
+            org_record = Organization.objects.filter(id=org_id).first()
+            if org_record is None:
+                continue
+            try:
+                changes = refresh_organization(org_record)
+            except Exception as exc:
+                failed += 1
+                self.stderr.write(f'{org_record.name}: failed {exc}')
+                continue
+            self.stdout.write(f'{org_record.name}: {changes["inserted"]} inserted, {changes["updated"]} updated, '
+                              f'{changes["deleted"]} deleted'
+                              + (', totals changed' if changes['totals'] else ''))
+        if failed:
+            raise CommandError(f'{failed} organizations failed to refresh.')
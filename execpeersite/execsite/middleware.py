@@ -0,0 +1,209 @@
+'''
+
+Per-request performance instrumentation: database, PeeringDB and template timings,
+sent as a Server-Timing header and aggregated per view for the /metrics endpoint
+'''
+import time
+import threading
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from utilities.prdb_requests import prdb_req
+from utilities.prdb_requests.client import LatencyHistogram
+
+# Timings of the request being handled by the current thread or task.
+CURRENT_TIMINGS = ContextVar('execsite_request_timings', default=None)
+
+
+class RequestTimings:
+    """
+    Counters of a single request. PeeringDB lookups may report from several threads.
+    """
+
+    def __init__(self):
+        self.view = 'unresolved'
+        self.db_count = 0
+        self.db_time = 0.0
+        self.peeringdb_count = 0
+        self.peeringdb_time = 0.0
+        self.render_time = 0.0
+        self._lock = threading.Lock()
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_count += 1
+            self.db_time += time.perf_counter() - start
+
+    def observe_peeringdb(self, seconds):
+        with self._lock:
+            self.peeringdb_count += 1
+            self.peeringdb_time += seconds
+
+    def server_timing(self, total):
+        """
+        :param total: seconds spent handling the request
+        :return: Server-Timing header value, durations in milliseconds
+        """
+        return ', '.join([
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.db_count} queries"',
+            f'peeringdb;dur={self.peeringdb_time * 1000:.1f};desc="{self.peeringdb_count} calls"',
+            f'render;dur={self.render_time * 1000:.1f}',
+            f'total;dur={total * 1000:.1f}',
+        ])
+
+
+class ViewMetrics:
+    """
+    Aggregated timings of the requests handled by a view in this process.
+    """
+
+    def __init__(self):
+        self.total = LatencyHistogram()
+        self.db = LatencyHistogram()
+        self.peeringdb = LatencyHistogram()
+        self.render = LatencyHistogram()
+        self.db_queries = 0
+        self.peeringdb_calls = 0
+
+
+class MetricsRegistry:
+
+    def __init__(self):
+        self.views = {}
+        self._lock = threading.Lock()
+
+    def record(self, timings, total):
+        with self._lock:
+            metrics = self.views.setdefault(timings.view, ViewMetrics())
+            metrics.db_queries += timings.db_count
+            metrics.peeringdb_calls += timings.peeringdb_count
+        metrics.total.observe(total)
+        metrics.db.observe(timings.db_time)
+        metrics.peeringdb.observe(timings.peeringdb_time)
+        metrics.render.observe(timings.render_time)
+
+    def exposition(self):
+        """
+        :return: metrics in the Prometheus text exposition format
+        """
+        with self._lock:
+            views = sorted(self.views.items())
+        lines = []
+        for name, attribute, help_text in (
+                ('execsite_request_duration_seconds', 'total', 'Time spent handling requests'),
+                ('execsite_db_duration_seconds', 'db', 'Time spent in database queries per request'),
+                ('execsite_peeringdb_duration_seconds', 'peeringdb', 'Time spent in PeeringDB lookups per request'),
+                ('execsite_render_duration_seconds', 'render', 'Time spent rendering templates per request')):
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+            for view, metrics in views:
+                lines += _histogram_lines(name, f'view="{view}"', getattr(metrics, attribute).snapshot())
+        for name, attribute, help_text in (
+                ('execsite_db_queries_total', 'db_queries', 'Database queries'),
+                ('execsite_peeringdb_calls_total', 'peeringdb_calls', 'PeeringDB lookups')):
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+            lines += [f'{name}{{view="{view}"}} {getattr(metrics, attribute)}' for view, metrics in views]
+        name = 'execsite_peeringdb_request_duration_seconds'
+        lines += [f'# HELP {name} PeeringDB API request latency by endpoint', f'# TYPE {name} histogram']
+        # The client only exists once this process has looked something up.
+        client = prdb_req.get_client(create=False)
+        for endpoint, histogram in sorted(client.latency.items() if client else ()):
+            lines += _histogram_lines(name, f'endpoint="{endpoint}"', histogram.snapshot())
+        return '\n'.join(lines) + '\n'
+
+
+def _histogram_lines(name, labels, snapshot):
+    lines = [f'{name}_bucket{{{labels},le="{"+Inf" if bound == float("inf") else bound}"}} {count}'
+             for bound, count in snapshot['buckets']]
+    lines.append(f'{name}_sum{{{labels}}} {snapshot["sum"]}')
+    lines.append(f'{name}_count{{{labels}}} {snapshot["count"]}')
+    return lines
+
+
+METRICS = MetricsRegistry()
+
+
+def record_peeringdb(path, seconds):
+    """
+    prdb_req retrieve hook adding a lookup to the timings of the current request.
+    """
+    timings = CURRENT_TIMINGS.get()
+    if timings is not None:
+        timings.observe_peeringdb(seconds)
+
+
+@contextmanager
+def measured(timings):
+    """
+    Attribute database queries and PeeringDB lookups made in the block to timings.
+    """
+    token = CURRENT_TIMINGS.set(timings)
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timings.execute_wrapper))
+            yield
+    finally:
+        CURRENT_TIMINGS.reset(token)
+
+
+class PerformanceMiddleware:
+    """
+    Records database, PeeringDB and template timings of each request when settings.PERFORMANCE_METRICS is set.
+    Otherwise Django unloads the middleware at startup and requests do not go through it.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'PERFORMANCE_METRICS', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if record_peeringdb not in prdb_req.RETRIEVE_HOOKS:
+            prdb_req.RETRIEVE_HOOKS.append(record_peeringdb)
+
+    def __call__(self, request):
+        timings = RequestTimings()
+        start = time.perf_counter()
+        with measured(timings):
+            response = self.get_response(request)
+        total = time.perf_counter() - start
+        response['Server-Timing'] = timings.server_timing(total)
+        if response.streaming:
+            # The header only covers the time until the response started; the metrics are recorded
+            # once the content is sent, including the queries made while it is generated.
+            response.streaming_content = self.measured_stream(response.streaming_content, timings, start)
+        else:
+            METRICS.record(timings, total)
+        return response
+
+    @staticmethod
+    def measured_stream(content, timings, start):
+        try:
+            content = iter(content)
+            while True:
+                with measured(timings):
+                    chunk = next(content, None)
+                if chunk is None:
+                    return
+                yield chunk
+        finally:
+            METRICS.record(timings, time.perf_counter() - start)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        timings = CURRENT_TIMINGS.get()
+        if timings is not None:
+            timings.view = view_func.__name__
+
+    def process_template_response(self, request, response):
+        # Called right before a TemplateResponse is rendered; the callback runs once it is.
+        timings = CURRENT_TIMINGS.get()
+        if timings is not None:
+            render_start = time.perf_counter()
+
+            def rendered(response):
+                timings.render_time += time.perf_counter() - render_start
+            response.add_post_render_callback(rendered)
+        return response
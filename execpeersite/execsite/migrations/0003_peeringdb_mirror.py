@@ -0,0 +1,72 @@
+# Generated by Django 2.2.28 on 2026-10-18 12:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('execsite', '0002_organization_total_exchanges'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MirrorIX',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('updated', models.DateTimeField(blank=True, null=True)),
+                ('data', models.TextField()),
+                ('org_id', models.IntegerField(db_index=True)),
+                ('name', models.CharField(max_length=255)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='MirrorNet',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('updated', models.DateTimeField(blank=True, null=True)),
+                ('data', models.TextField()),
+                ('org_id', models.IntegerField(db_index=True)),
+                ('asn', models.IntegerField(db_index=True)),
+                ('name', models.CharField(db_index=True, max_length=255)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='MirrorNetIXLan',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('updated', models.DateTimeField(blank=True, null=True)),
+                ('data', models.TextField()),
+                ('net_id', models.IntegerField(db_index=True)),
+                ('ix_id', models.IntegerField(db_index=True)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='MirrorOrg',
+            fields=[
+                ('id', models.IntegerField(primary_key=True, serialize=False)),
+                ('updated', models.DateTimeField(blank=True, null=True)),
+                ('data', models.TextField()),
+                ('name', models.CharField(db_index=True, max_length=255)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='MirrorSync',
+            fields=[
+                ('resource', models.CharField(max_length=16, primary_key=True, serialize=False)),
+                ('last_sync', models.IntegerField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 2.2.28 on 2026-10-18 12:21
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('execsite', '0003_peeringdb_mirror'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IngestJob',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=128)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Resolving exchanges'), ('writing', 'Writing connections'), ('done', 'Done'), ('failed', 'Failed')], db_index=True, default='queued', max_length=8)),
+                ('ixs_total', models.IntegerField(default=0)),
+                ('ixs_resolved', models.IntegerField(default=0)),
+                ('rows_written', models.IntegerField(default=0)),
+                ('error', models.TextField(blank=True)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('updated', models.DateTimeField(auto_now=True)),
+                ('organization', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='execsite.Organization')),
+            ],
+        ),
+    ]
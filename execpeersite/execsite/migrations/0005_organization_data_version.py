@@ -0,0 +1,19 @@
+# Generated by Django 2.2.28 on 2026-10-18 12:25
+
+from django.db import migrations, models
+import execsite.models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('execsite', '0004_ingestjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='organization',
+            name='data_version',
+            field=models.BigIntegerField(default=execsite.models.new_data_version),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 2.2.28 on 2026-10-18 12:31
+
+from django.db import migrations, models
+
+
+def normalize_names(apps, schema_editor):
+    # Same folding as execsite.models.normalize_name at the time of this migration.
+    Organization = apps.get_model('execsite', 'Organization')
+    for org_id, name in Organization.objects.values_list('id', 'name').iterator():
+        Organization.objects.filter(id=org_id).update(name_normalized=' '.join(name.split()).casefold())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('execsite', '0005_organization_data_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='organization',
+            name='name_normalized',
+            field=models.CharField(db_index=True, default='', editable=False, max_length=128),
+        ),
+        migrations.RunPython(normalize_names, migrations.RunPython.noop),
+    ]
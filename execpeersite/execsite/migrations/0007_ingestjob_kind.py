@@ -0,0 +1,18 @@
+# Generated by Django 2.2.28 on 2026-10-18 12:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('execsite', '0006_organization_name_normalized'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ingestjob',
+            name='kind',
+            field=models.CharField(choices=[('ingest', 'Ingest'), ('refresh', 'Refresh')], default='ingest', max_length=8),
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 2.2.28 on 2026-10-18 12:45
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def link_exchanges(apps, schema_editor):
+    """
+    Create an Exchange per distinct exchange point name and link the connections to it.
+    Names are matched to a PeeringDB ix id through the local mirror when it is loaded.
+    Duplicate (organization, peer, exchange) connections are dropped, keeping the first one.
+    """
+    Connectivity = apps.get_model('execsite', 'Connectivity')
+    Exchange = apps.get_model('execsite', 'Exchange')
+    MirrorIX = apps.get_model('execsite', 'MirrorIX')
+
+    names = sorted(set(Connectivity.objects.values_list('exchange_point', flat=True)), key=lambda name: name or '')
+    ix_ids = {}
+    for ix_id, name in MirrorIX.objects.filter(name__in=[name for name in names if name]).values_list('id', 'name'):
+        # Names shared by several exchanges cannot be matched.
+        ix_ids[name] = None if name in ix_ids else ix_id
+    for name in names:
+        exchange = Exchange.objects.create(ix_id=ix_ids.get(name), name=name or '')
+        connections = Connectivity.objects.filter(exchange_point__isnull=True) if name is None else \
+            Connectivity.objects.filter(exchange_point=name)
+        connections.update(exchange=exchange)
+
+    seen = set()
+    duplicates = []
+    for conn_id, org_id, peer_id, exchange_id in Connectivity.objects.order_by('id') \
+            .values_list('id', 'org_name_id', 'peer_name_id', 'exchange_id'):
+        key = (org_id, peer_id, exchange_id)
+        if key in seen:
+            duplicates.append(conn_id)
+        seen.add(key)
+    for i in range(0, len(duplicates), 500):
+        Connectivity.objects.filter(id__in=duplicates[i:i + 500]).delete()
+
+
+def unlink_exchanges(apps, schema_editor):
+    Connectivity = apps.get_model('execsite', 'Connectivity')
+    Exchange = apps.get_model('execsite', 'Exchange')
+    for exchange_id, name in Exchange.objects.values_list('id', 'name'):
+        Connectivity.objects.filter(exchange_id=exchange_id).update(exchange_point=name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('execsite', '0007_ingestjob_kind'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Exchange',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('ix_id', models.IntegerField(blank=True, null=True, unique=True)),
+                ('name', models.CharField(db_index=True, max_length=128)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='connectivity',
+            name='exchange',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE,
+                                    related_name='connections', to='execsite.Exchange'),
+        ),
+        migrations.RunPython(link_exchanges, unlink_exchanges),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 2.2.28 on 2026-10-18 12:45
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('execsite', '0008_exchange'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='connectivity',
+            name='exchange_point',
+        ),
+        migrations.AlterField(
+            model_name='connectivity',
+            name='exchange',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='connections',
+                                    to='execsite.Exchange'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='connectivity',
+            unique_together={('org_name', 'peer_name', 'exchange')},
+        ),
+    ]
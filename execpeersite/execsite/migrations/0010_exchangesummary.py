@@ -0,0 +1,44 @@
+# Generated by Django 2.2.28 on 2026-10-18 12:52
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def build_summaries(apps, schema_editor):
+    Connectivity = apps.get_model('execsite', 'Connectivity')
+    ExchangeSummary = apps.get_model('execsite', 'ExchangeSummary')
+    totals = Connectivity.objects.order_by().values('exchange_id').annotate(
+        org_count=models.Count('org_name', distinct=True),
+        connection_count=models.Sum('connection_count'),
+        total_capacity=models.Sum('capacity'),
+    )
+    ExchangeSummary.objects.bulk_create([
+        ExchangeSummary(exchange_id=total['exchange_id'], org_count=total['org_count'],
+                        connection_count=total['connection_count'] or 0, total_capacity=total['total_capacity'] or 0)
+        for total in totals
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('execsite', '0009_connectivity_exchange_required'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExchangeSummary',
+            fields=[
+                ('exchange', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True,
+                                                  related_name='summary', serialize=False,
+                                                  to='execsite.Exchange')),
+                ('org_count', models.IntegerField(default=0)),
+                ('connection_count', models.IntegerField(default=0)),
+                ('total_capacity', models.BigIntegerField(db_index=True, default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'Exchange summaries',
+            },
+        ),
+        migrations.RunPython(build_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,166 @@
+'''
+
+Local PeeringDB mirror: snapshot import, incremental sync and a backend for prdb_req.Organization
+'''
+import re
+import logging
+from itertools import islice
+from django.conf import settings
+from django.db import transaction
+from execsite.models import MirrorOrg, MirrorIX, MirrorNet, MirrorNetIXLan, MirrorSync
+
+MIRROR_MODELS = {model.resource: model for model in (MirrorOrg, MirrorIX, MirrorNet, MirrorNetIXLan)}
+BATCH_SIZE = 500
+LOGGER = logging.getLogger(__name__)
+
+
+def _batches(iterable, size=BATCH_SIZE):
+    iterator = iter(iterable)
+    batch = list(islice(iterator, size))
+    while batch:
+        yield batch
+        batch = list(islice(iterator, size))
+
+
+def _timestamp(records):
+    updated = [record.updated for record in records if record.updated]
+    return int(max(updated).timestamp()) if updated else None
+
+
+def load_snapshot(resource, objects, timestamp=None):
+    """
+    Replace the mirror table of a resource with a full PeeringDB dump.
+    :param resource: PeeringDB resource name, i.e. ix
+    :param objects: iterable of API objects
+    :param timestamp: unix time the dump was generated. Defaults to the newest updated value in the dump.
+    :return: number of objects loaded
+    """
+    model = MIRROR_MODELS[resource]
+    loaded = 0
+    newest = None
+    with transaction.atomic():
+        model.objects.all().delete()
+        for batch in _batches(obj for obj in objects if obj.get('status') != 'deleted'):
+            records = [model.from_api(obj) for obj in batch]
+            model.objects.bulk_create(records)
+            loaded += len(records)
+            newest = max(filter(None, [newest, _timestamp(records)]), default=None)
+        timestamp = timestamp or newest
+        if timestamp:
+            MirrorSync.objects.update_or_create(resource=resource, defaults={'last_sync': timestamp})
+    return loaded
+
+
+def sync_changes(resource, objects, timestamp):
+    """
+    Apply objects changed since the last sync. Objects with status deleted are removed from the mirror.
+    :param resource: PeeringDB resource name, i.e. ix
+    :param objects: iterable of API objects returned for ?since=
+    :param timestamp: unix time the changes were requested
+    :return: (number of objects written, number of objects deleted)
+    """
+    model = MIRROR_MODELS[resource]
+    written = deleted = 0
+    with transaction.atomic():
+        for batch in _batches(objects):
+            model.objects.filter(id__in=[obj['id'] for obj in batch]).delete()
+            records = [model.from_api(obj) for obj in batch if obj.get('status') != 'deleted']
+            model.objects.bulk_create(records)
+            written += len(records)
+            deleted += len(batch) - len(records)
+        MirrorSync.objects.update_or_create(resource=resource, defaults={'last_sync': timestamp})
+    return written, deleted
+
+
+class MirrorClient:
+    """
+    Answers the PeeringDB API paths used by prdb_req.Organization from the mirror tables.
+    Supports /<resource>, /<resource>/<id> and filters on the indexed columns (field, field__in, name__contains).
+    """
+    path_re = re.compile(r'^/(?P<resource>\w+?)(?:/(?P<id>\d+))?/?$')
+    # Database connections are per thread, lookups stay on the calling thread.
+    concurrent = False
+
+    def get(self, path, **params):
+        resource, object_id, queryset = self.queryset(path, params)
+        objects = [record.as_api() for record in queryset]
+        if object_id or int(params.get('depth', 0)):
+            self.expand(resource, objects)
+        return {'meta': {}, 'data': objects}
+
+    def stream(self, path, **params):
+        """
+        Objects of get(path, **params), read from the database in chunks when no sets need to be expanded.
+        """
+        resource, object_id, queryset = self.queryset(path, params)
+        if object_id or int(params.get('depth', 0)):
+            yield from self.get(path, **params)['data']
+            return
+        for record in queryset.iterator(chunk_size=BATCH_SIZE):
+            yield record.as_api()
+
+    def queryset(self, path, params):
+        """
+        :return: (resource, object id or None, queryset of mirror records ordered by id)
+        """
+        match = self.path_re.match(path)
+        if not match or match.group('resource') not in MIRROR_MODELS:
+            raise ValueError(f'Path is not available in the PeeringDB mirror: {path}')
+        resource, object_id = match.group('resource'), match.group('id')
+        model = MIRROR_MODELS[resource]
+        queryset = model.objects.all()
+        if object_id:
+            queryset = queryset.filter(id=int(object_id))
+        return resource, object_id, queryset.filter(**self.filters(model, params)).order_by('id')
+
+    @staticmethod
+    def filters(model, params):
+        fields = ('id',) + model.lookup_fields
+        filters = {}
+        for key, value in params.items():
+            field, _, lookup = key.partition('__')
+            if field not in fields:
+                continue
+            if lookup == 'in':
+                values = str(value).split(',')
+                filters[f'{field}__in'] = values if field == 'name' else [int(v) for v in values]
+            elif lookup == 'contains':
+                # PeeringDB matches __contains case-insensitively.
+                filters[f'{field}__icontains'] = value
+            elif not lookup:
+                filters[field] = value
+        return filters
+
+    @staticmethod
+    def expand(resource, objects):
+        """
+        Add the sets PeeringDB returns for object (depth 2) and expanded list (depth 1) queries.
+        """
+        ids = [obj['id'] for obj in objects]
+        if resource == 'net':
+            netixlan_sets = {}
+            for record in MirrorNetIXLan.objects.filter(net_id__in=ids).order_by('id'):
+                netixlan_sets.setdefault(record.net_id, []).append(record.as_api())
+            for obj in objects:
+                obj['netixlan_set'] = netixlan_sets.get(obj['id'], [])
+        elif resource == 'org':
+            ix_sets = {}
+            for org_id, ix_id in MirrorIX.objects.filter(org_id__in=ids).order_by('id').values_list('org_id', 'id'):
+                ix_sets.setdefault(org_id, []).append(ix_id)
+            for obj in objects:
+                obj['ix_set'] = ix_sets.get(obj['id'], [])
+        elif resource == 'ix':
+            org_ids = {obj['org_id'] for obj in objects}
+            orgs = {org['id']: org for org in MirrorClient().get('/org', id__in=','.join(map(str, org_ids)),
+                                                                   depth=1)['data']} if org_ids else {}
+            for obj in objects:
+                obj['org'] = orgs.get(obj['org_id'])
+
+
+def get_backend():
+    """
+    :return: backend for prdb_req.Organization as selected by settings.PEERING_DB_BACKEND, None for the live API.
+    """
+    if getattr(settings, 'PEERING_DB_BACKEND', 'api') == 'mirror':
+        return MirrorClient()
+    return None
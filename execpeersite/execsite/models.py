@@ -1,15 +1,49 @@
+import json
+import time
 from django.db import models
 from django.forms import ModelForm
 from django.core.validators import ValidationError
+from django.utils.dateparse import parse_datetime
+
+
+def new_data_version():
+    """
+    :return: data version for an organization whose connections were just written, in microseconds since the epoch
+    """
+    return time.time_ns() // 1000
+
+
+def normalize_name(name):
+    """
+    :return: name folded for case-insensitive search, with runs of whitespace collapsed
+    """
+    return ' '.join(name.split()).casefold()
+
+
+def name_prefix_filter(name):
+    """
+    :return: filter arguments matching organizations whose normalized name starts with the normalized name.
+             A range on the indexed column, as SQLite runs __startswith and __contains as scans.
+    """
+    prefix = normalize_name(name)
+    return {'name_normalized__gte': prefix, 'name_normalized__lt': prefix + '\U0010ffff'}
 
 
 class Organization(models.Model):
     name = models.CharField(max_length=128, unique=True)
+    # Search column, kept in sync with name by save(). The index serves name_prefix_filter() lookups.
+    name_normalized = models.CharField(max_length=128, db_index=True, editable=False, default='')
     asn = models.IntegerField(null=True, blank=True, unique=True)
     total_peers = models.IntegerField(null=True, blank=True)
     total_capacity = models.IntegerField(null=True, blank=True)
     total_exchanges = models.IntegerField(null=True, blank=True)
     unique_orgs = models.IntegerField(null=True, blank=True)
+    # Changes whenever connections are written; part of the cache key of rendered diagrams.
+    data_version = models.BigIntegerField(default=new_data_version)
+
+    def save(self, *args, **kwargs):
+        self.name_normalized = normalize_name(self.name)
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return self.name
@@ -28,23 +62,166 @@ class PeerOrganization(models.Model):
         return self.name
 
 
+class Exchange(models.Model):
+    # PeeringDB ix id. Null for exchanges migrated from names that could not be matched to an ix.
+    ix_id = models.IntegerField(null=True, blank=True, unique=True)
+    name = models.CharField(max_length=128, db_index=True)
+
+    def __str__(self):
+        return self.name
+
+
+class ExchangeSummary(models.Model):
+    """
+    Totals of the stored connections at an exchange. Maintained incrementally by the services writing
+    connections and when organizations are deleted; `manage.py rebuild_exchange_summaries` recomputes them
+    from Connectivity.
+    """
+    exchange = models.OneToOneField(Exchange, on_delete=models.CASCADE, primary_key=True, related_name='summary')
+    org_count = models.IntegerField(default=0)
+    connection_count = models.IntegerField(default=0)
+    total_capacity = models.BigIntegerField(default=0, db_index=True)
+
+    class Meta:
+        verbose_name_plural = 'Exchange summaries'
+
+    def __str__(self):
+        return f'{self.exchange}:{self.org_count}'
+
+
 class Connectivity(models.Model):
     org_name = models.ForeignKey(Organization, on_delete=models.CASCADE)
     peer_name = models.ForeignKey(PeerOrganization, on_delete=models.CASCADE)
-    exchange_point = models.CharField(max_length=128, null=True, blank=True)
+    exchange = models.ForeignKey(Exchange, on_delete=models.CASCADE, related_name='connections')
     connection_count = models.IntegerField(null=True, blank=True)
     capacity = models.IntegerField(null=True, blank=True)
 
     class Meta:
         verbose_name_plural = 'Connections'
+        unique_together = (('org_name', 'peer_name', 'exchange'),)
+
+    def __str__(self):
+        return f'{self.org_name}:{self.exchange}'
+
+
+class MirrorObject(models.Model):
+    """
+    Local copy of a PeeringDB object. The API document is kept as-is in data,
+    the columns used to answer lookups are copied out and indexed.
+    """
+    id = models.IntegerField(primary_key=True)
+    updated = models.DateTimeField(null=True, blank=True)
+    data = models.TextField()
+
+    class Meta:
+        abstract = True
+
+    @classmethod
+    def from_api(cls, obj):
+        record = cls(id=obj['id'], updated=parse_datetime(obj.get('updated') or ''), data=json.dumps(obj))
+        for field in cls.lookup_fields:
+            setattr(record, field, obj.get(field))
+        return record
+
+    def as_api(self):
+        return json.loads(self.data)
+
+
+class MirrorOrg(MirrorObject):
+    resource = 'org'
+    lookup_fields = ('name',)
+    name = models.CharField(max_length=255, db_index=True)
+
+
+class MirrorIX(MirrorObject):
+    resource = 'ix'
+    lookup_fields = ('org_id', 'name')
+    org_id = models.IntegerField(db_index=True)
+    name = models.CharField(max_length=255)
+
+
+class MirrorNet(MirrorObject):
+    resource = 'net'
+    lookup_fields = ('org_id', 'asn', 'name')
+    org_id = models.IntegerField(db_index=True)
+    asn = models.IntegerField(db_index=True)
+    name = models.CharField(max_length=255, db_index=True)
+
+
+class MirrorNetIXLan(MirrorObject):
+    resource = 'netixlan'
+    lookup_fields = ('net_id', 'ix_id')
+    net_id = models.IntegerField(db_index=True)
+    ix_id = models.IntegerField(db_index=True)
+
+
+class MirrorSync(models.Model):
+    """
+    Unix timestamp of the last snapshot or sync per PeeringDB resource, used as the API's since parameter.
+    """
+    resource = models.CharField(max_length=16, primary_key=True)
+    last_sync = models.IntegerField()
+
+    def __str__(self):
+        return f'{self.resource}:{self.last_sync}'
+
+
+class IngestJob(models.Model):
+    """
+    Queued PeeringDB ingestion or refresh of an organization, processed by `manage.py ingest_worker`.
+    """
+    INGEST = 'ingest'
+    REFRESH = 'refresh'
+    KIND_CHOICES = (
+        (INGEST, 'Ingest'),
+        (REFRESH, 'Refresh'),
+    )
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    WRITING = 'writing'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Resolving exchanges'),
+        (WRITING, 'Writing connections'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    )
+
+    name = models.CharField(max_length=128)
+    kind = models.CharField(max_length=8, choices=KIND_CHOICES, default=INGEST)
+    status = models.CharField(max_length=8, choices=STATUS_CHOICES, default=QUEUED, db_index=True)
+    ixs_total = models.IntegerField(default=0)
+    ixs_resolved = models.IntegerField(default=0)
+    rows_written = models.IntegerField(default=0)
+    organization = models.ForeignKey(Organization, null=True, blank=True, on_delete=models.SET_NULL)
+    error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
+
+    @property
+    def organization_url(self):
+        """
+        :return: page of the stored organization once the job is done, None while it runs or after the
+                 organization was deleted
+        """
+        if self.status == self.DONE and self.organization_id is not None:
+            return f'/orgs/{self.organization_id}'
+        return None
+
+    @property
+    def organization_deleted(self):
+        return self.status == self.DONE and self.organization_id is None
 
     def __str__(self):
-        return f'{self.org_name}:{self.exchange_point}'
+        return f'{self.name}:{self.status}'
 
 
 class OrganizationForm(ModelForm):
     def clean_name(self):
-        if [org.name for org in Organization.objects.all() if self.data['name'].lower() in org.name.lower()]:
+        # Prefix match on the indexed normalized name.
+        if Organization.objects.filter(**name_prefix_filter(self.data['name'])).exists():
             raise ValidationError('The name provided has a partial or full match to an existing organization.',
                                   code='invalid',
                                   params={'name': self.data['name']}
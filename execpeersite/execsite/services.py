@@ -0,0 +1,599 @@
+'''
+
+Persistence of PeeringDB ingestion results, bulk ingestion and the ingestion job queue
+'''
+import os
+import re
+import json
+import logging
+from itertools import islice
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Case, Count, F, IntegerField, Q, Sum, Value, When
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+from execsite.models import Organization, PeerOrganization, Connectivity, Exchange, ExchangeSummary, IngestJob, \
+    new_data_version, normalize_name
+from execsite.mirror import get_backend
+from utilities.prdb_requests.prdb_req import Organization as prdb_org
+
+BATCH_SIZE = 500
+# Networks fetched from PeeringDB at the same time by bulk_ingest.
+INGEST_WORKERS = 4
+ASN_RE = re.compile(r'^(?:AS)?(\d+)$', re.IGNORECASE)
+LOGGER = logging.getLogger(__name__)
+
+
+def _chunks(values, size=BATCH_SIZE):
+    for i in range(0, len(values), size):
+        yield values[i:i + size]
+
+
+def _org_connections(org_class):
+    """
+    :param org_class: prdb_req.Organization after peer_metrics()
+    :return: {exchange_point: (peer_org, {'conn_count': n, 'capacity': n, 'ix_id': n})}
+    """
+    # Only the first connection to an exchange point is kept for an organization. PeeringDB names
+    # netixlan records after their LAN, i.e. "Netnod Stockholm: STH-A -- MTU1500", so the LANs of an
+    # exchange are merged into the connection found first.
+    connections = {}
+    exchange_points = {}
+    for peer_org, org_data in org_class.peer_info.items():
+        for peer_set in org_data['peer_sets']:
+            for exchange_point, peer_set_data in peer_set.items():
+                first = exchange_points.setdefault(peer_set_data['ix_id'], exchange_point)
+                if first == exchange_point:
+                    connections.setdefault(exchange_point, (peer_org, peer_set_data))
+                elif connections[first][0] == peer_org:
+                    merged = dict(connections[first][1])
+                    merged['conn_count'] += peer_set_data['conn_count']
+                    merged['capacity'] += peer_set_data['capacity']
+                    connections[first] = (peer_org, merged)
+    return connections
+
+
+def _peer_ids(peer_names, batch_size=BATCH_SIZE):
+    """
+    Resolve peer organizations by name, bulk inserting the missing ones.
+    :param peer_names: list of unique peer organization names
+    :return: {peer_name: PeerOrganization id}
+    """
+    peer_ids = {}
+    for names in _chunks(peer_names, batch_size):
+        peer_ids.update(PeerOrganization.objects.filter(name__in=names).values_list('name', 'id'))
+    missing = [name for name in peer_names if name not in peer_ids]
+    if missing:
+        try:
+            with transaction.atomic():
+                PeerOrganization.objects.bulk_create([PeerOrganization(name=name) for name in missing],
+                                                     batch_size=batch_size)
+        except IntegrityError:
+            # A concurrent ingestion inserted some of the peer organizations first.
+            for name in missing:
+                PeerOrganization.objects.get_or_create(name=name)
+        for names in _chunks(missing, batch_size):
+            peer_ids.update(PeerOrganization.objects.filter(name__in=names).values_list('name', 'id'))
+    return peer_ids
+
+
+def _exchange_names(org_class):
+    """
+    :param org_class: prdb_req.Organization after peer_metrics()
+    :return: {ix_id: exchange name}, {ix_id: names of the exchange's LANs}
+    """
+    # Exchanges are named after the /ix record; the name of the first LAN is only used when it is unknown.
+    names, lan_names = {}, {}
+    for org_data in org_class.peer_info.values():
+        for peer_set in org_data['peer_sets']:
+            for exchange_point, peer_set_data in peer_set.items():
+                ix_id = peer_set_data['ix_id']
+                names.setdefault(ix_id, org_class.ix_names.get(ix_id, exchange_point))
+                lan_names.setdefault(ix_id, set()).add(exchange_point)
+    return names, lan_names
+
+
+def _exchange_ids(exchanges, lan_names=None, batch_size=BATCH_SIZE):
+    """
+    Resolve exchanges by PeeringDB ix id, bulk inserting the missing ones and renaming the ones whose name changed.
+    Exchanges without an ix id, left by migration 0008 when no mirror was loaded, are claimed by name.
+    :param exchanges: {ix_id: exchange name}
+    :param lan_names: {ix_id: names of the exchange's LANs}, also matched when claiming exchanges by name
+    :return: {ix_id: Exchange id}
+    """
+    ix_ids = list(exchanges)
+    stored = {}
+    for ids in _chunks(ix_ids, batch_size):
+        stored.update((ix_id, (exchange_id, name)) for exchange_id, ix_id, name in
+                      Exchange.objects.filter(ix_id__in=ids).values_list('id', 'ix_id', 'name'))
+    for ix_id, (exchange_id, name) in stored.items():
+        if name != exchanges[ix_id]:
+            Exchange.objects.filter(id=exchange_id).update(name=exchanges[ix_id])
+    exchange_ids = {ix_id: exchange_id for ix_id, (exchange_id, name) in stored.items()}
+    missing = [ix_id for ix_id in ix_ids if ix_id not in exchange_ids]
+    if missing:
+        claimable = {}
+        for ix_id in missing:
+            for name in [exchanges[ix_id]] + sorted((lan_names or {}).get(ix_id, ())):
+                claimable.setdefault(name, ix_id)
+        unlinked = []
+        for names in _chunks(list(claimable), batch_size):
+            unlinked += Exchange.objects.filter(ix_id__isnull=True, name__in=names).values_list('id', 'name')
+        for exchange_id, name in sorted(unlinked):
+            ix_id = claimable[name]
+            if ix_id not in exchange_ids and Exchange.objects.filter(id=exchange_id, ix_id__isnull=True) \
+                    .update(ix_id=ix_id, name=exchanges[ix_id]):
+                exchange_ids[ix_id] = exchange_id
+        missing = [ix_id for ix_id in missing if ix_id not in exchange_ids]
+    if missing:
+        try:
+            with transaction.atomic():
+                Exchange.objects.bulk_create([Exchange(ix_id=ix_id, name=exchanges[ix_id]) for ix_id in missing],
+                                             batch_size=batch_size)
+        except IntegrityError:
+            # A concurrent ingestion inserted some of the exchanges first.
+            for ix_id in missing:
+                Exchange.objects.get_or_create(ix_id=ix_id, defaults={'name': exchanges[ix_id]})
+        for ids in _chunks(missing, batch_size):
+            exchange_ids.update(Exchange.objects.filter(ix_id__in=ids).values_list('ix_id', 'id'))
+    return exchange_ids
+
+
+def _apply_exchange_deltas(deltas, batch_size=BATCH_SIZE):
+    """
+    Add changes to the exchange summaries: one lookup, one insert and one update per batch of exchanges.
+    :param deltas: {exchange_id: [org_count change, connection_count change, total_capacity change]}
+    """
+    deltas = {exchange_id: delta for exchange_id, delta in deltas.items() if any(delta)}
+    exchange_ids = list(deltas)
+    for ids in _chunks(exchange_ids, batch_size):
+        stored = set(ExchangeSummary.objects.filter(exchange_id__in=ids).values_list('exchange_id', flat=True))
+        missing = [exchange_id for exchange_id in ids if exchange_id not in stored]
+        if missing:
+            try:
+                with transaction.atomic():
+                    ExchangeSummary.objects.bulk_create([
+                        ExchangeSummary(exchange_id=exchange_id, org_count=deltas[exchange_id][0],
+                                        connection_count=deltas[exchange_id][1],
+                                        total_capacity=deltas[exchange_id][2])
+                        for exchange_id in missing
+                    ])
+            except IntegrityError:
+                # A concurrent ingestion inserted some of the summaries first; the changes are added to those.
+                for exchange_id in missing:
+                    summary, created = ExchangeSummary.objects.get_or_create(exchange_id=exchange_id, defaults={
+                        'org_count': deltas[exchange_id][0],
+                        'connection_count': deltas[exchange_id][1],
+                        'total_capacity': deltas[exchange_id][2],
+                    })
+                    if not created:
+                        stored.add(exchange_id)
+        if stored:
+            def change(index):
+                return Case(*[When(exchange_id=exchange_id, then=Value(deltas[exchange_id][index]))
+                              for exchange_id in stored], default=Value(0), output_field=IntegerField())
+            ExchangeSummary.objects.filter(exchange_id__in=stored).update(
+                org_count=F('org_count') + change(0),
+                connection_count=F('connection_count') + change(1),
+                total_capacity=F('total_capacity') + change(2),
+            )
+
+
+@receiver(pre_delete, sender=Organization)
+def subtract_exchange_totals(sender, instance, **kwargs):
+    """
+    Remove an organization that is being deleted, i.e. from the admin, from the summaries of its exchanges.
+    Its connections are still stored at this point and are deleted along with it.
+    """
+    totals = Connectivity.objects.filter(org_name=instance).order_by().values('exchange_id').annotate(
+        connection_count=Sum('connection_count'),
+        total_capacity=Sum('capacity'),
+    )
+    _apply_exchange_deltas({total['exchange_id']: [-1, -(total['connection_count'] or 0),
+                                                   -(total['total_capacity'] or 0)] for total in totals})
+
+
+def rebuild_exchange_summaries(batch_size=BATCH_SIZE):
+    """
+    Recompute every exchange summary from the stored connections, i.e. after connections were changed
+    without going through the services of this module.
+    :return: number of exchange summaries
+    """
+    with transaction.atomic():
+        ExchangeSummary.objects.all().delete()
+        totals = Connectivity.objects.order_by().values('exchange_id').annotate(
+            org_count=Count('org_name', distinct=True),
+            connection_count=Sum('connection_count'),
+            total_capacity=Sum('capacity'),
+        )
+        summaries = [ExchangeSummary(exchange_id=total['exchange_id'], org_count=total['org_count'],
+                                     connection_count=total['connection_count'] or 0,
+                                     total_capacity=total['total_capacity'] or 0) for total in totals]
+        ExchangeSummary.objects.bulk_create(summaries, batch_size=batch_size)
+    return len(summaries)
+
+
+def persist_organization(org_class, batch_size=BATCH_SIZE):
+    """
+    Store an ingested organization, its peer organizations and connections in a single transaction.
+    Peer organizations are resolved with one query per batch and missing rows are bulk inserted,
+    so the number of queries does not depend on the number of exchanges.
+    :param org_class: prdb_req.Organization after peer_metrics()
+    :param batch_size: rows per bulk insert and per name__in lookup
+    :return: Organization record
+    """
+    connections = _org_connections(org_class)
+
+    with transaction.atomic():
+        org_record = Organization.objects.create(
+            name=org_class.org_name,
+            asn=org_class.asn,
+            total_peers=org_class.total_peers,
+            total_capacity=org_class.total_capacity,
+            unique_orgs=org_class.unique_orgs,
+            total_exchanges=org_class.total_exchanges,
+            data_version=new_data_version(),
+        )
+        peer_ids = _peer_ids(list(org_class.peer_info), batch_size)
+        exchange_ids = _exchange_ids(*_exchange_names(org_class), batch_size=batch_size)
+        Connectivity.objects.bulk_create([
+            Connectivity(
+                org_name=org_record,
+                peer_name_id=peer_ids[peer_org],
+                exchange_id=exchange_ids[peer_set_data['ix_id']],
+                connection_count=peer_set_data['conn_count'],
+                capacity=peer_set_data['capacity'],
+            )
+            for exchange_point, (peer_org, peer_set_data) in connections.items()
+        ], batch_size=batch_size)
+
+        deltas = {}
+        for exchange_point, (peer_org, peer_set_data) in connections.items():
+            delta = deltas.setdefault(exchange_ids[peer_set_data['ix_id']], [1, 0, 0])
+            delta[1] += peer_set_data['conn_count'] or 0
+            delta[2] += peer_set_data['capacity'] or 0
+        _apply_exchange_deltas(deltas, batch_size)
+    return org_record
+
+
+def refresh_organization(org_record, backend=None, progress=None, batch_size=BATCH_SIZE):
+    """
+    Re-fetch a stored organization from PeeringDB and apply only the differences to its connections.
+    PeeringDB is queried even for responses held by the response cache.
+    Stored connections are matched to the fetched ones by (exchange, peer organization): new pairs are
+    inserted, pairs whose count or capacity changed are updated and pairs no longer present are deleted.
+    The organization row and its data version are only written when something changed.
+    :param org_record: Organization record
+    :param backend: PeeringDB backend for prdb_req.Organization. Defaults to settings.PEERING_DB_BACKEND.
+    :param progress: called with (exchanges resolved, total exchanges) while peer information is retrieved
+    :param batch_size: rows per bulk insert, per name__in lookup and per delete
+    :return: {'inserted': n, 'updated': n, 'deleted': n, 'totals': True when the organization totals changed}
+    """
+    backend = backend or get_backend()
+    if org_record.asn is not None:
+        org_class = prdb_org(asn=org_record.asn, backend=backend, progress=progress, cache=False)
+    else:
+        org_class = prdb_org(org_record.name, backend=backend, progress=progress, cache=False)
+    org_class.peer_metrics()
+    connections = {(peer_set_data['ix_id'], peer_org): peer_set_data
+                   for exchange_point, (peer_org, peer_set_data) in _org_connections(org_class).items()}
+    names, lan_names = _exchange_names(org_class)
+    totals = {
+        'total_peers': org_class.total_peers,
+        'total_capacity': org_class.total_capacity,
+        'unique_orgs': org_class.unique_orgs,
+        'total_exchanges': org_class.total_exchanges,
+    }
+
+    with transaction.atomic():
+        stored = Connectivity.objects.filter(org_name=org_record).values_list(
+            'id', 'exchange_id', 'exchange__ix_id', 'exchange__name', 'peer_name__name', 'connection_count',
+            'capacity')
+        if any(ix_id is None for conn_id, exchange_id, ix_id, *fields in stored):
+            # Exchanges migrated without an ix id are claimed by name first, so their connections are kept.
+            _exchange_ids(names, lan_names, batch_size)
+            stored = stored.all()
+        # changed: conn_id -> (connection_count, capacity) after the refresh
+        deleted, changed, renamed = [], {}, set()
+        # exchange_id -> [org_count, connection_count, total_capacity] changes, and connections of the
+        # organization per exchange before and after the refresh.
+        deltas, rows_before, rows_after = {}, {}, {}
+        for conn_id, exchange_id, ix_id, exchange_name, peer_org, connection_count, capacity in stored:
+            rows_before[exchange_id] = rows_before.get(exchange_id, 0) + 1
+            peer_set_data = connections.pop((ix_id, peer_org), None)
+            delta = deltas.setdefault(exchange_id, [0, 0, 0])
+            if peer_set_data is None:
+                deleted.append(conn_id)
+                delta[1] -= connection_count or 0
+                delta[2] -= capacity or 0
+                continue
+            rows_after[exchange_id] = rows_after.get(exchange_id, 0) + 1
+            if (connection_count, capacity) != (peer_set_data['conn_count'], peer_set_data['capacity']):
+                changed[conn_id] = (peer_set_data['conn_count'], peer_set_data['capacity'])
+                delta[1] += (peer_set_data['conn_count'] or 0) - (connection_count or 0)
+                delta[2] += (peer_set_data['capacity'] or 0) - (capacity or 0)
+            if exchange_name != names[ix_id]:
+                renamed.add(ix_id)
+        # One update per batch of changed connections rather than one per connection.
+        for conn_ids in _chunks(list(changed), batch_size):
+            def value(index):
+                return Case(*[When(id=conn_id, then=Value(changed[conn_id][index])) for conn_id in conn_ids],
+                            output_field=IntegerField())
+            Connectivity.objects.filter(id__in=conn_ids).update(connection_count=value(0), capacity=value(1))
+        for conn_ids in _chunks(deleted, batch_size):
+            Connectivity.objects.filter(id__in=conn_ids).delete()
+        # Remaining connections are new. Their exchanges are resolved along with the renamed ones.
+        if connections or renamed:
+            exchange_ids = _exchange_ids({ix_id: names[ix_id] for ix_id in
+                                          renamed.union(ix_id for ix_id, peer_org in connections)},
+                                         lan_names, batch_size)
+        if connections:
+            peer_ids = _peer_ids(list(dict.fromkeys(peer_org for ix_id, peer_org in connections)), batch_size)
+            Connectivity.objects.bulk_create([
+                Connectivity(
+                    org_name=org_record,
+                    peer_name_id=peer_ids[peer_org],
+                    exchange_id=exchange_ids[ix_id],
+                    connection_count=peer_set_data['conn_count'],
+                    capacity=peer_set_data['capacity'],
+                )
+                for (ix_id, peer_org), peer_set_data in connections.items()
+            ], batch_size=batch_size)
+            for (ix_id, peer_org), peer_set_data in connections.items():
+                exchange_id = exchange_ids[ix_id]
+                rows_after[exchange_id] = rows_after.get(exchange_id, 0) + 1
+                delta = deltas.setdefault(exchange_id, [0, 0, 0])
+                delta[1] += peer_set_data['conn_count'] or 0
+                delta[2] += peer_set_data['capacity'] or 0
+        for exchange_id, delta in deltas.items():
+            delta[0] = bool(rows_after.get(exchange_id)) - bool(rows_before.get(exchange_id))
+        _apply_exchange_deltas(deltas, batch_size)
+
+        totals_changed = any(getattr(org_record, field) != value for field, value in totals.items())
+        if totals_changed or changed or deleted or connections or renamed:
+            for field, value in totals.items():
+                setattr(org_record, field, value)
+            org_record.data_version = new_data_version()
+            Organization.objects.filter(id=org_record.id).update(data_version=org_record.data_version, **totals)
+    return {'inserted': len(connections), 'updated': len(changed), 'deleted': len(deleted), 'totals': totals_changed}
+
+
+def _live_jobs():
+    """
+    :return: filter matching queued jobs and running jobs whose worker reported within settings.INGEST_JOB_TIMEOUT
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.INGEST_JOB_TIMEOUT)
+    return Q(status=IngestJob.QUEUED) | Q(status__in=(IngestJob.RUNNING, IngestJob.WRITING), updated__gte=cutoff)
+
+
+def enqueue_ingest(name):
+    """
+    Queue ingestion of an organization. A queued or running job for the same name is reused, unless its worker
+    stopped reporting progress.
+    :param name: organization name as submitted to query_view
+    :return: IngestJob
+    """
+    with transaction.atomic():
+        job = IngestJob.objects.filter(_live_jobs(), kind=IngestJob.INGEST, name__iexact=name).order_by('id').first()
+        if job is None:
+            job = IngestJob.objects.create(name=name)
+    return job
+
+
+def enqueue_refresh(org_record):
+    """
+    Queue a refresh of a stored organization. A queued or running refresh of the organization is reused, unless its
+    worker stopped reporting progress.
+    :param org_record: Organization record
+    :return: IngestJob
+    """
+    with transaction.atomic():
+        job = IngestJob.objects.filter(_live_jobs(), kind=IngestJob.REFRESH, organization=org_record) \
+            .order_by('id').first()
+        if job is None:
+            job = IngestJob.objects.create(kind=IngestJob.REFRESH, name=org_record.name, organization=org_record)
+    return job
+
+
+def claim_next_job():
+    """
+    Mark the oldest queued job as running. Safe to call from several workers at once.
+    Running jobs that have not reported progress for settings.INGEST_JOB_TIMEOUT seconds belong to a worker that
+    died and are queued again first.
+    :return: claimed IngestJob or None when the queue is empty
+    """
+    IngestJob.objects.filter(status__in=(IngestJob.RUNNING, IngestJob.WRITING)).exclude(_live_jobs()) \
+        .update(status=IngestJob.QUEUED, ixs_resolved=0, updated=timezone.now())
+    for job_id in IngestJob.objects.filter(status=IngestJob.QUEUED).order_by('id').values_list('id', flat=True)[:10]:
+        if IngestJob.objects.filter(id=job_id, status=IngestJob.QUEUED).update(status=IngestJob.RUNNING,
+                                                                               updated=timezone.now()):
+            return IngestJob.objects.get(id=job_id)
+    return None
+
+
+def run_ingest_job(job, backend=None):
+    """
+    Retrieve an organization from PeeringDB and persist it, or refresh a stored one, recording progress on the job.
+    :param job: IngestJob claimed by claim_next_job()
+    :param backend: PeeringDB backend for prdb_req.Organization. Defaults to settings.PEERING_DB_BACKEND.
+    :return: IngestJob
+    """
+    def report(ixs_resolved, ixs_total):
+        job.ixs_resolved, job.ixs_total = ixs_resolved, ixs_total
+        IngestJob.objects.filter(id=job.id).update(ixs_resolved=ixs_resolved, ixs_total=ixs_total,
+                                                   updated=timezone.now())
+
+    try:
+        if job.kind == IngestJob.REFRESH:
+            if job.organization is None:
+                raise ValueError(f'{job.name} was deleted before it could be refreshed')
+            changes = refresh_organization(job.organization, backend=backend, progress=report)
+            job.rows_written = changes['inserted'] + changes['updated'] + changes['deleted']
+        else:
+            org_class = prdb_org(job.name, backend=backend or get_backend(), progress=report)
+            org_record = Organization.objects.filter(name=org_class.org_name).first()
+            if org_record is None:
+                org_class.peer_metrics()
+                job.status = IngestJob.WRITING
+                job.save(update_fields=['status', 'updated'])
+                org_record = persist_organization(org_class)
+                job.rows_written = 1 + Connectivity.objects.filter(org_name=org_record).count()
+            job.organization = org_record
+        job.status = IngestJob.DONE
+    except Exception as exc:
+        LOGGER.exception(f'Ingestion of {job.name} failed')
+        job.status = IngestJob.FAILED
+        job.error = str(exc) or exc.__class__.__name__
+    job.save()
+    return job
+
+
+def parse_ingest_entry(entry):
+    """
+    :param entry: network name or ASN, i.e. Twitch, 46489 or AS46489
+    :return: ('asn', int) or ('name', str)
+    """
+    match = ASN_RE.match(entry)
+    if match:
+        return 'asn', int(match.group(1))
+    return 'name', entry
+
+
+def existing_organization(entry):
+    """
+    :return: stored Organization matching an ingest entry by ASN or normalized name, None when it is not stored
+    """
+    field, value = parse_ingest_entry(entry)
+    if field == 'asn':
+        return Organization.objects.filter(asn=value).first()
+    return Organization.objects.filter(name_normalized=normalize_name(value)).first()
+
+
+def fetch_organization(entry, backend=None):
+    """
+    Retrieve a network and aggregate its peers. Runs without database access, so it can run in worker threads.
+    :param entry: network name or ASN
+    :param backend: PeeringDB backend for prdb_req.Organization
+    :return: prdb_req.Organization after peer_metrics()
+    """
+    field, value = parse_ingest_entry(entry)
+    # Concurrency is bounded by the bulk ingest workers, each network is resolved from its own thread.
+    org_class = prdb_org(**{'org_name' if field == 'name' else 'asn': value}, max_workers=1, backend=backend)
+    org_class.peer_metrics()
+    return org_class
+
+
+class IngestCheckpoint:
+    """
+    Append-only record of the entries completed by bulk_ingest, one JSON document per line.
+    Each line is flushed to disk before the next entry is reported, so a crashed run resumes where it stopped.
+    """
+    COMPLETED = ('created', 'exists')
+
+    def __init__(self, path):
+        self.path = path
+
+    def completed(self):
+        """
+        :return: set of entries created or found already stored. Failed entries are retried.
+        """
+        if not os.path.exists(self.path):
+            return set()
+        status = {}
+        with open(self.path) as checkpoint_file:
+            for line in checkpoint_file:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Last line cut short by a crash
+                    continue
+                status[record['entry']] = record['status']
+        return {entry for entry, entry_status in status.items() if entry_status in self.COMPLETED}
+
+    def record(self, entry, status, **details):
+        with open(self.path, 'a') as checkpoint_file:
+            checkpoint_file.write(json.dumps(dict(details, entry=entry, status=status)) + '\n')
+            checkpoint_file.flush()
+            os.fsync(checkpoint_file.fileno())
+
+    def clear(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def bulk_ingest(entries, workers=INGEST_WORKERS, checkpoint=None, backend=None, progress=None):
+    """
+    Ingest many networks. PeeringDB lookups run in up to workers threads, results are persisted
+    from the calling thread as they complete. Entries already stored or completed in the checkpoint are skipped.
+    :param entries: iterable of network names or ASNs
+    :param workers: networks fetched concurrently. Backends with concurrent = False are used from the calling thread.
+    :param checkpoint: IngestCheckpoint recording completed entries, None to disable resuming
+    :param backend: PeeringDB backend for prdb_req.Organization. Defaults to settings.PEERING_DB_BACKEND.
+    :param progress: called with (entry, status, error) after each entry. Status is created, exists or failed.
+    :return: {'created': n, 'exists': n, 'failed': n, 'skipped': n}
+    """
+    backend = backend or get_backend()
+    if not getattr(backend, 'concurrent', True):
+        workers = 1
+    completed = checkpoint.completed() if checkpoint else set()
+    counts = {'created': 0, 'exists': 0, 'failed': 0, 'skipped': 0}
+
+    def finish(entry, status, error=None, **details):
+        counts[status] += 1
+        if checkpoint:
+            checkpoint.record(entry, status, error=error, **details)
+        if progress:
+            progress(entry, status, error)
+
+    def to_fetch():
+        for entry in dict.fromkeys(entries):
+            if entry in completed:
+                counts['skipped'] += 1
+                continue
+            org_record = existing_organization(entry)
+            if org_record is not None:
+                finish(entry, 'exists', org_id=org_record.id)
+                continue
+            yield entry
+
+    def fetch(entry):
+        try:
+            return fetch_organization(entry, backend=backend), None
+        except Exception as exc:
+            LOGGER.exception(f'Ingestion of {entry} failed')
+            return None, str(exc) or exc.__class__.__name__
+
+    def fetched():
+        if workers <= 1:
+            for entry in to_fetch():
+                yield (entry,) + fetch(entry)
+            return
+        pending = to_fetch()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # Keep a bounded window of lookups in flight rather than queueing every entry at once.
+            in_flight = {executor.submit(fetch, entry): entry for entry in islice(pending, workers * 2)}
+            while in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield (in_flight.pop(future),) + future.result()
+                in_flight.update({executor.submit(fetch, entry): entry for entry in islice(pending, len(done))})
+
+    for entry, org_class, error in fetched():
+        if org_class is None:
+            finish(entry, 'failed', error=error)
+            continue
+        org_record = Organization.objects.filter(name=org_class.org_name).first()
+        if org_record is not None:
+            finish(entry, 'exists', org_id=org_record.id)
+            continue
+        try:
+            org_record = persist_organization(org_class)
+        except Exception as exc:
+            LOGGER.exception(f'Persisting {entry} failed')
+            finish(entry, 'failed', error=str(exc) or exc.__class__.__name__)
+            continue
+        finish(entry, 'created', org_id=org_record.id)
+    return counts
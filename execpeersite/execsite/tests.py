@@ -1,4 +1,798 @@
-from django.test import TestCase
-from execsite.models import Organization
+import io
+import os
+import csv
+import copy
+import json
+import tempfile
+from datetime import timedelta
+from django.http import HttpResponse
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.utils import timezone
+from django.test.utils import CaptureQueriesContext
+from django.test import TestCase, LiveServerTestCase, RequestFactory, override_settings
+from execsite.middleware import PerformanceMiddleware, METRICS
+from execsite.models import Organization, PeerOrganization, Connectivity, Exchange, ExchangeSummary, MirrorNetIXLan, \
+    MirrorSync, IngestJob, OrganizationForm, name_prefix_filter
+from execsite.mirror import MirrorClient, load_snapshot, sync_changes
+from execsite.services import persist_organization, enqueue_ingest, claim_next_job, run_ingest_job, bulk_ingest, \
+    IngestCheckpoint, refresh_organization, enqueue_refresh, rebuild_exchange_summaries
+from utilities.prdb_requests.cache import MemoryCache
+from utilities.prdb_requests.client import PeeringDBClient
+from utilities.prdb_requests.prdb_req import Organization as prdb_org
+from benchmarks.suite import compare
+from benchmarks.fixtures import recorded_network
+from benchmarks.peeringdb_stub import PeeringDBStub, StubServer, latency_distribution
+from benchmarks.startup import PROBES, load_budget, measure, over_budget
+from benchmarks.loadtest import DEFAULT_MIX, parse_mix, percentile, summarize, run_load, discover_targets
+from benchmarks.synthetic import synthetic_network, synthetic_networks, FixtureBackend
 
-# Create your tests here.
+
+def netixlan(netixlan_id, ix_id, name, speed, net_id=1956):
+    return {'id': netixlan_id, 'net_id': net_id, 'ix_id': ix_id, 'name': name, 'speed': speed,
+            'updated': '2018-10-01T00:00:00Z', 'status': 'ok'}
+
+
+PEERINGDB_DUMP = {
+    'org': {'data': [
+        {'id': 12067, 'name': 'Twitch', 'updated': '2016-03-14T21:14:25Z', 'status': 'ok'},
+        {'id': 10, 'name': 'Equinix', 'updated': '2017-01-01T00:00:00Z', 'status': 'ok'},
+        {'id': 11, 'name': 'DE-CIX Management GmbH', 'updated': '2017-01-01T00:00:00Z', 'status': 'ok'},
+    ]},
+    'ix': {'data': [
+        {'id': 4, 'org_id': 10, 'name': 'Equinix Los Angeles', 'updated': '2017-01-01T00:00:00Z', 'status': 'ok'},
+        {'id': 1, 'org_id': 10, 'name': 'Equinix Ashburn', 'updated': '2017-01-01T00:00:00Z', 'status': 'ok'},
+        {'id': 31, 'org_id': 11, 'name': 'DE-CIX Frankfurt', 'updated': '2017-01-01T00:00:00Z', 'status': 'ok'},
+    ]},
+    'net': {'data': [
+        {'id': 1956, 'org_id': 12067, 'name': 'Twitch', 'asn': 46489, 'updated': '2018-10-01T00:00:00Z',
+         'status': 'ok'},
+    ]},
+    'netixlan': {'data': [
+        netixlan(1, 4, 'Equinix Los Angeles', 10000),
+        netixlan(2, 4, 'Equinix Los Angeles', 10000),
+        netixlan(3, 1, 'Equinix Ashburn', 100000),
+        netixlan(4, 31, 'DE-CIX Frankfurt', 20000),
+    ]},
+}
+
+
+class MirrorTests(TestCase):
+
+    def setUp(self):
+        for resource, dump in PEERINGDB_DUMP.items():
+            load_snapshot(resource, dump['data'])
+
+    def test_organization_from_mirror(self):
+        org_class = prdb_org('twitch', backend=MirrorClient())
+        self.assertEqual((org_class.org_name, org_class.asn, org_class.net_id), ('Twitch', 46489, 1956))
+        org_class.peer_metrics()
+        self.assertEqual(list(org_class.peer_info), ['Equinix', 'DE-CIX Management GmbH'])
+        self.assertEqual(org_class.peer_info['Equinix']['peer_sets'], [
+            {'Equinix Los Angeles': {'conn_count': 2, 'capacity': 20000, 'ix_id': 4}},
+            {'Equinix Ashburn': {'conn_count': 1, 'capacity': 100000, 'ix_id': 1}},
+        ])
+        self.assertEqual((org_class.total_peers, org_class.total_capacity, org_class.total_exchanges,
+                          org_class.unique_orgs), (4, 140000, 3, 2))
+
+    def test_organization_stream_from_mirror(self):
+        streamed = prdb_org('twitch', backend=MirrorClient(), stream=True).PeerOrganization()
+        self.assertEqual(streamed, prdb_org('twitch', backend=MirrorClient()).PeerOrganization())
+        self.assertEqual([netixlan['id'] for netixlan in MirrorClient().stream('/netixlan', net_id=1956)],
+                         sorted(MirrorNetIXLan.objects.filter(net_id=1956).values_list('id', flat=True)))
+
+    def test_sync_changes(self):
+        changes = [dict(netixlan(2, 4, 'Equinix Los Angeles', 100000)),
+                   dict(netixlan(3, 1, 'Equinix Ashburn', 100000), status='deleted')]
+        self.assertEqual(sync_changes('netixlan', changes, 1538352000), (1, 1))
+        self.assertEqual(sorted(MirrorNetIXLan.objects.values_list('id', flat=True)), [1, 2, 4])
+        self.assertEqual(MirrorNetIXLan.objects.get(id=2).as_api()['speed'], 100000)
+        self.assertEqual(MirrorSync.objects.get(resource='netixlan').last_sync, 1538352000)
+
+    def test_mirror_command_file(self):
+        dump = dict(PEERINGDB_DUMP, ix={'meta': {'generated': 1538000000}, 'data': PEERINGDB_DUMP['ix']['data'][:2]})
+        with tempfile.NamedTemporaryFile('w', suffix='.json', delete=False) as dump_file:
+            json.dump(dump, dump_file)
+        try:
+            call_command('prdb_mirror', file=dump_file.name, resource=['ix'], stdout=open(os.devnull, 'w'))
+        finally:
+            os.remove(dump_file.name)
+        self.assertEqual(MirrorClient().get('/ix', id__in='4,1,31')['data'][1]['name'], 'Equinix Los Angeles')
+        self.assertEqual(len(MirrorClient().get('/ix')['data']), 2)
+        self.assertEqual(MirrorSync.objects.get(resource='ix').last_sync, 1538000000)
+        self.assertEqual(MirrorSync.objects.get(resource='net').last_sync, 1538352000)
+
+
+def ingest_synthetic(records, net_id=1, exchanges=None):
+    """
+    :return: prdb_req.Organization for a synthetic network after peer_metrics()
+    """
+    dataset = synthetic_network(records, exchanges=exchanges, net_id=net_id)
+    org_class = prdb_org(dataset['net'][0]['name'], backend=FixtureBackend(dataset))
+    org_class.peer_metrics()
+    return org_class
+
+
+def insert_after_lookup(table, insert):
+    """
+    :return: execute_wrapper calling insert() right after the first lookup in table, as a concurrent ingestion would
+    """
+    inserted = []
+
+    def wrapper(execute, sql, params, many, context):
+        result = execute(sql, params, many, context)
+        if not inserted and sql.startswith('SELECT') and f'FROM "{table}"' in sql:
+            inserted.append(insert())
+        return result
+    return wrapper
+
+
+class PersistenceTests(TestCase):
+
+    def test_persist_organization(self):
+        org_class = ingest_synthetic(200)
+        org_record = persist_organization(org_class)
+        self.assertEqual(org_record.name, 'Synthetic Network 1')
+        self.assertEqual((org_record.total_peers, org_record.total_capacity), (200, org_class.total_capacity))
+        self.assertEqual(PeerOrganization.objects.count(), org_class.unique_orgs)
+        self.assertEqual(Connectivity.objects.filter(org_name=org_record).count(), org_class.total_exchanges)
+        expected = {(peer_org, exchange_point, data['conn_count'], data['capacity'])
+                    for peer_org, org_data in org_class.peer_info.items()
+                    for peer_set in org_data['peer_sets'] for exchange_point, data in peer_set.items()}
+        self.assertEqual(set(Connectivity.objects.values_list(
+            'peer_name__name', 'exchange__name', 'connection_count', 'capacity')), expected)
+
+    def test_persist_organization_query_count(self):
+        # Peer organizations of the second network partly exist already.
+        small, large = ingest_synthetic(10, net_id=1, exchanges=2), ingest_synthetic(3000, net_id=2, exchanges=150)
+        # Savepoint, organization insert, peer lookup, peer insert, peer lookup, exchange lookup, unlinked exchange
+        # lookup, exchange insert, exchange lookup, connection insert, summary lookup, summary insert, release.
+        # Peer, exchange and summary inserts run in their own savepoint.
+        with self.assertNumQueries(19):
+            persist_organization(small)
+        # Summaries of the exchanges shared with the first network are updated in one more query.
+        with self.assertNumQueries(20):
+            persist_organization(large)
+        self.assertEqual(Organization.objects.count(), 2)
+        self.assertEqual(Connectivity.objects.count(), 2 + 150)
+        self.assertEqual(sorted(Exchange.objects.values_list('ix_id', flat=True)), list(range(1, 151)))
+
+    def test_persist_exchange_lans(self):
+        # PeeringDB names netixlan records after their LAN, i.e. the four LANs of Netnod Stockholm.
+        dataset = synthetic_network(40, exchanges=4)
+        lans = [record for record in dataset['netixlan'] if record['ix_id'] == 1]
+        for index, record in enumerate(lans):
+            record['name'] = f'{record["name"]}: LAN {"AB"[index % 2]}'
+        # Left by migration 0008 without an ix id, named after a LAN.
+        unlinked = Exchange.objects.create(name=lans[-1]['name'])
+        org_class = prdb_org(dataset['net'][0]['name'], backend=FixtureBackend(dataset))
+        org_class.peer_metrics()
+        org_record = persist_organization(org_class)
+        connection = Connectivity.objects.get(org_name=org_record, exchange__ix_id=1)
+        self.assertEqual(connection.connection_count, len(lans))
+        self.assertEqual(connection.capacity, sum(record['speed'] for record in lans))
+        self.assertEqual((connection.exchange_id, connection.exchange.name), (unlinked.id, 'Exchange 1'))
+        self.assertEqual(Connectivity.objects.filter(org_name=org_record).count(), 4)
+        self.assertEqual(Exchange.objects.count(), 4)
+
+    def test_persist_concurrent_exchange_insert(self):
+        org_class = ingest_synthetic(40, exchanges=4)
+        with connection.execute_wrapper(insert_after_lookup(
+                'execsite_exchange', lambda: Exchange.objects.create(ix_id=2, name='Exchange 2'))):
+            org_record = persist_organization(org_class)
+        self.assertEqual(sorted(Exchange.objects.values_list('ix_id', flat=True)), [1, 2, 3, 4])
+        self.assertEqual(Connectivity.objects.filter(org_name=org_record).count(), 4)
+
+    def test_persist_concurrent_peer_insert(self):
+        org_class = ingest_synthetic(40, exchanges=4)
+        peer_name = next(iter(org_class.peer_info))
+        with connection.execute_wrapper(insert_after_lookup(
+                'execsite_peerorganization', lambda: PeerOrganization.objects.create(name=peer_name))):
+            org_record = persist_organization(org_class)
+        self.assertEqual(PeerOrganization.objects.count(), org_class.unique_orgs)
+        self.assertEqual(Connectivity.objects.filter(org_name=org_record).count(), 4)
+
+
+def exchange_summaries():
+    return set(ExchangeSummary.objects.filter(org_count__gt=0).values_list(
+        'exchange_id', 'org_count', 'connection_count', 'total_capacity'))
+
+
+def rebuilt_exchange_summaries():
+    maintained = exchange_summaries()
+    rebuild_exchange_summaries()
+    return maintained, exchange_summaries()
+
+
+class RefreshTests(TestCase):
+
+    def setUp(self):
+        self.dataset = synthetic_network(300, exchanges=20)
+        self.org_record = persist_organization(ingest_synthetic(300, exchanges=20))
+
+    def stored_connections(self):
+        return set(Connectivity.objects.filter(org_name=self.org_record).values_list(
+            'peer_name__name', 'exchange__name', 'connection_count', 'capacity'))
+
+    def test_refresh_unchanged(self):
+        stored, data_version = self.stored_connections(), self.org_record.data_version
+        # Savepoint, connection lookup, release.
+        with self.assertNumQueries(3):
+            changes = refresh_organization(self.org_record, backend=FixtureBackend(self.dataset))
+        self.assertEqual(changes, {'inserted': 0, 'updated': 0, 'deleted': 0, 'totals': False})
+        self.assertEqual(self.stored_connections(), stored)
+        self.assertEqual(Organization.objects.get(id=self.org_record.id).data_version, data_version)
+
+    def test_refresh_changes(self):
+        dataset = copy.deepcopy(self.dataset)
+        for netixlan in dataset['netixlan']:
+            if netixlan['ix_id'] == 1:
+                netixlan['speed'] += 1000
+            elif netixlan['ix_id'] == 3:
+                netixlan['name'] = 'Exchange 3 Renamed'
+        dataset['ix'][2]['name'] = 'Exchange 3 Renamed'
+        dataset['netixlan'] = [netixlan for netixlan in dataset['netixlan'] if netixlan['ix_id'] != 2]
+        dataset['ix'].append({'id': 21, 'org_id': 1, 'name': 'Exchange 21', 'status': 'ok'})
+        dataset['netixlan'].append({'id': 301, 'net_id': 1, 'ix_id': 21, 'name': 'Exchange 21', 'speed': 10000,
+                                    'asn': 64513, 'status': 'ok'})
+        data_version = self.org_record.data_version
+        changes = refresh_organization(self.org_record, backend=FixtureBackend(dataset))
+        self.assertEqual(changes, {'inserted': 1, 'updated': 1, 'deleted': 1, 'totals': True})
+
+        org_class = prdb_org('Synthetic Network 1', backend=FixtureBackend(dataset))
+        org_class.peer_metrics()
+        self.assertEqual(self.stored_connections(), {
+            (peer_org, exchange_point, data['conn_count'], data['capacity'])
+            for peer_org, org_data in org_class.peer_info.items()
+            for peer_set in org_data['peer_sets'] for exchange_point, data in peer_set.items()})
+        org_record = Organization.objects.get(id=self.org_record.id)
+        self.assertEqual((org_record.total_peers, org_record.total_capacity, org_record.total_exchanges),
+                         (org_class.total_peers, org_class.total_capacity, org_class.total_exchanges))
+        self.assertGreater(org_record.data_version, data_version)
+        self.assertEqual(Exchange.objects.get(ix_id=3).name, 'Exchange 3 Renamed')
+        maintained, rebuilt = rebuilt_exchange_summaries()
+        self.assertEqual(maintained, rebuilt)
+        self.assertNotIn(Exchange.objects.get(ix_id=2).id, {summary[0] for summary in maintained})
+
+    def test_refresh_batches_updates(self):
+        dataset = copy.deepcopy(self.dataset)
+        for netixlan in dataset['netixlan']:
+            netixlan['speed'] += 1000
+        with CaptureQueriesContext(connection) as queries:
+            changes = refresh_organization(self.org_record, backend=FixtureBackend(dataset))
+        self.assertEqual(changes['updated'], Connectivity.objects.filter(org_name=self.org_record).count())
+        updates = [query for query in queries if query['sql'].startswith('UPDATE "execsite_connectivity"')]
+        self.assertEqual(len(updates), 1)
+        org_class = prdb_org('Synthetic Network 1', backend=FixtureBackend(dataset))
+        org_class.peer_metrics()
+        self.assertEqual(self.stored_connections(), {
+            (peer_org, exchange_point, data['conn_count'], data['capacity'])
+            for peer_org, org_data in org_class.peer_info.items()
+            for peer_set in org_data['peer_sets'] for exchange_point, data in peer_set.items()})
+
+    def test_refresh_bypasses_response_cache(self):
+        stub = PeeringDBStub(self.dataset)
+        server = StubServer(stub).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        client = PeeringDBClient(server.url, cache=MemoryCache(ttl=3600, max_entries=100))
+        prdb_org('Synthetic Network 1', backend=client).peer_metrics()
+        dataset = copy.deepcopy(self.dataset)
+        for netixlan in dataset['netixlan']:
+            if netixlan['ix_id'] == 1:
+                netixlan['speed'] += 1000
+        stub.backend = FixtureBackend(dataset)
+        changes = refresh_organization(self.org_record, backend=client)
+        self.assertEqual((changes['updated'], changes['totals']), (1, True))
+
+    def test_refresh_unlinked_exchange(self):
+        # Exchange migrated without an ix id: its connections are kept and the exchange is linked again.
+        exchange = Exchange.objects.get(ix_id=5)
+        Exchange.objects.filter(id=exchange.id).update(ix_id=None)
+        stored = self.stored_connections()
+        changes = refresh_organization(self.org_record, backend=FixtureBackend(self.dataset))
+        self.assertEqual(changes, {'inserted': 0, 'updated': 0, 'deleted': 0, 'totals': False})
+        self.assertEqual(self.stored_connections(), stored)
+        self.assertEqual(Exchange.objects.get(ix_id=5).id, exchange.id)
+
+    def test_refresh_view_and_worker(self):
+        self.assertEqual(self.client.get(f'/orgs/{self.org_record.id}/refresh/').status_code, 405)
+        response = self.client.post(f'/orgs/{self.org_record.id}/refresh/')
+        job = IngestJob.objects.get()
+        self.assertRedirects(response, f'/jobs/{job.id}/', fetch_redirect_response=False)
+        self.assertEqual(enqueue_refresh(self.org_record).id, job.id)
+        self.assertEqual(enqueue_ingest(self.org_record.name).kind, IngestJob.INGEST)
+
+        job = run_ingest_job(claim_next_job(), backend=FixtureBackend(self.dataset))
+        self.assertEqual((job.kind, job.status, job.rows_written), (IngestJob.REFRESH, IngestJob.DONE, 0))
+        self.assertEqual(job.organization_id, self.org_record.id)
+
+
+class IngestJobTests(TestCase):
+
+    def test_enqueue_coalesces(self):
+        job = enqueue_ingest('Twitch')
+        self.assertEqual(enqueue_ingest('twitch').id, job.id)
+        IngestJob.objects.filter(id=job.id).update(status=IngestJob.DONE)
+        self.assertNotEqual(enqueue_ingest('Twitch').id, job.id)
+
+    def test_run_ingest_job(self):
+        dataset = synthetic_network(100)
+        enqueue_ingest('Synthetic Network')
+        job = claim_next_job()
+        self.assertEqual(job.status, IngestJob.RUNNING)
+        self.assertIsNone(claim_next_job())
+        job = run_ingest_job(job, backend=FixtureBackend(dataset))
+        self.assertEqual(job.status, IngestJob.DONE)
+        self.assertEqual(job.organization.name, 'Synthetic Network 1')
+        self.assertEqual(job.ixs_resolved, job.ixs_total)
+        self.assertEqual(job.ixs_total, len({netixlan['ix_id'] for netixlan in dataset['netixlan']}))
+        self.assertEqual(job.rows_written, 1 + Connectivity.objects.count())
+
+    @override_settings(INGEST_JOB_TIMEOUT=60)
+    def test_stale_job_requeued(self):
+        job = enqueue_ingest('Twitch')
+        claim_next_job()
+        self.assertEqual(enqueue_ingest('Twitch').id, job.id)
+        self.assertIsNone(claim_next_job())
+
+        # The worker died: the job stops reporting progress and is handed to the next worker.
+        IngestJob.objects.filter(id=job.id).update(updated=timezone.now() - timedelta(seconds=120))
+        other = enqueue_ingest('Twitch')
+        self.assertNotEqual(other.id, job.id)
+        self.assertEqual(claim_next_job().id, job.id)
+        self.assertEqual(claim_next_job().id, other.id)
+
+    def test_run_ingest_job_failure(self):
+        enqueue_ingest('Unknown Network')
+        job = run_ingest_job(claim_next_job(), backend=FixtureBackend(synthetic_network(10)))
+        self.assertEqual(job.status, IngestJob.FAILED)
+        self.assertEqual(job.error, 'No PeeringDB network named Unknown Network')
+        self.assertFalse(Organization.objects.exists())
+        self.assertContains(self.client.get(f'/jobs/{job.id}/'), 'No PeeringDB network named Unknown Network')
+
+    @override_settings(PEERING_DB_BACKEND='mirror')
+    def test_query_view_and_worker(self):
+        for resource, dump in PEERINGDB_DUMP.items():
+            load_snapshot(resource, dump['data'])
+        response = self.client.post('/query/', {'name': 'twitch'})
+        job = IngestJob.objects.get()
+        self.assertRedirects(response, f'/jobs/{job.id}/', fetch_redirect_response=False)
+        self.assertEqual(self.client.get(f'/jobs/{job.id}.json').json()['status'], IngestJob.QUEUED)
+        self.assertContains(self.client.get(f'/jobs/{job.id}/'), 'Queued')
+
+        call_command('ingest_worker', once=True, stdout=open(os.devnull, 'w'))
+        org_record = Organization.objects.get(name='Twitch')
+        self.assertEqual(self.client.get(f'/jobs/{job.id}.json').json()['url'], f'/orgs/{org_record.id}')
+        self.assertRedirects(self.client.get(f'/jobs/{job.id}/'), f'/orgs/{org_record.id}',
+                             fetch_redirect_response=False)
+
+        output = io.StringIO()
+        call_command('refresh', all=True, stdout=output)
+        self.assertEqual(output.getvalue(), 'Twitch: 0 inserted, 0 updated, 0 deleted\n')
+
+        # The organization was deleted since: the job no longer points to it.
+        org_record.delete()
+        status = self.client.get(f'/jobs/{job.id}.json').json()
+        self.assertEqual((status['status'], status['url'], status['organization_deleted']),
+                         (IngestJob.DONE, None, True))
+        self.assertContains(self.client.get(f'/jobs/{job.id}/'), 'The organization was deleted')
+
+
+class ConcurrentFixtureBackend(FixtureBackend):
+    concurrent = True
+
+
+class BulkIngestTests(TestCase):
+
+    def setUp(self):
+        checkpoint_file = tempfile.NamedTemporaryFile(suffix='.checkpoint', delete=False)
+        checkpoint_file.close()
+        self.checkpoint = IngestCheckpoint(checkpoint_file.name)
+        self.addCleanup(self.checkpoint.clear)
+
+    def test_bulk_ingest_resume(self):
+        backend = FixtureBackend(synthetic_networks(3))
+        entries = ['Synthetic Network 1', 'AS64514', 'Unknown Network', 'Synthetic Network 1']
+        reported = []
+        counts = bulk_ingest(entries, checkpoint=self.checkpoint, backend=backend,
+                             progress=lambda entry, status, error: reported.append((entry, status)))
+        self.assertEqual(counts, {'created': 2, 'exists': 0, 'failed': 1, 'skipped': 0})
+        self.assertEqual(reported, [('Synthetic Network 1', 'created'), ('AS64514', 'created'),
+                                    ('Unknown Network', 'failed')])
+        self.assertEqual(Organization.objects.get(asn=64514).name, 'Synthetic Network 2')
+
+        # Completed entries are skipped, failed entries retried and stored networks are not fetched again.
+        counts = bulk_ingest(entries + ['64513', '64515'], checkpoint=self.checkpoint, backend=backend)
+        self.assertEqual(counts, {'created': 1, 'exists': 1, 'failed': 1, 'skipped': 2})
+        self.assertEqual(self.checkpoint.completed(), {'Synthetic Network 1', 'AS64514', '64513', '64515'})
+
+    def test_bulk_ingest_concurrent(self):
+        sequential = {org_class.org_name: org_class.peer_info
+                      for org_class in (ingest_synthetic(40, net_id=net_id) for net_id in range(1, 7))}
+        counts = bulk_ingest([str(64512 + net_id) for net_id in range(1, 7)], workers=3,
+                             backend=ConcurrentFixtureBackend(synthetic_networks(6)))
+        self.assertEqual(counts['created'], 6)
+        for name, peer_info in sequential.items():
+            org_record = Organization.objects.get(name=name)
+            self.assertEqual(Connectivity.objects.filter(org_name=org_record).count(),
+                             len({exchange_point for org_data in peer_info.values()
+                                  for peer_set in org_data['peer_sets'] for exchange_point in peer_set}))
+
+    @override_settings(PEERING_DB_BACKEND='mirror')
+    def test_ingest_command(self):
+        for resource, dump in PEERINGDB_DUMP.items():
+            load_snapshot(resource, dump['data'])
+        with tempfile.NamedTemporaryFile('w', suffix='.txt', delete=False) as entry_file:
+            entry_file.write('# networks\nTwitch\n\nAS46489\n')
+        self.addCleanup(os.remove, entry_file.name)
+        self.addCleanup(IngestCheckpoint(f'{entry_file.name}.checkpoint').clear)
+        call_command('ingest', entry_file.name, stdout=open(os.devnull, 'w'))
+        self.assertEqual(Organization.objects.get().name, 'Twitch')
+        self.assertEqual(IngestCheckpoint(f'{entry_file.name}.checkpoint').completed(), {'Twitch', 'AS46489'})
+
+
+class ExchangeSummaryTests(TestCase):
+
+    def test_exchange_summaries(self):
+        for net_id in range(1, 4):
+            persist_organization(ingest_synthetic(200, net_id=net_id, exchanges=30))
+        maintained, rebuilt = rebuilt_exchange_summaries()
+        self.assertEqual(maintained, rebuilt)
+        self.assertEqual(sum(summary[1] for summary in maintained), Connectivity.objects.count())
+        call_command('rebuild_exchange_summaries', stdout=open(os.devnull, 'w'))
+        self.assertEqual(exchange_summaries(), rebuilt)
+
+    def test_delete_organization(self):
+        org_records = [persist_organization(ingest_synthetic(200, net_id=net_id, exchanges=30))
+                       for net_id in range(1, 4)]
+        org_records[0].delete()
+        Organization.objects.filter(id=org_records[1].id).delete()
+        maintained, rebuilt = rebuilt_exchange_summaries()
+        self.assertEqual(maintained, rebuilt)
+        self.assertEqual(sum(summary[1] for summary in maintained), Connectivity.objects.count())
+
+    def test_concurrent_summary_insert(self):
+        def insert():
+            return ExchangeSummary.objects.create(exchange=Exchange.objects.get(ix_id=1), org_count=1,
+                                                  connection_count=5, total_capacity=1000)
+        with connection.execute_wrapper(insert_after_lookup('execsite_exchangesummary', insert)):
+            org_record = persist_organization(ingest_synthetic(40, exchanges=4))
+        connection_count, capacity = Connectivity.objects.filter(org_name=org_record, exchange__ix_id=1) \
+            .values_list('connection_count', 'capacity').get()
+        self.assertEqual(ExchangeSummary.objects.filter(exchange__ix_id=1).values_list(
+            'org_count', 'connection_count', 'total_capacity').get(), (2, 5 + connection_count, 1000 + capacity))
+        self.assertEqual(ExchangeSummary.objects.count(), 4)
+
+    def test_exchange_summary_view(self):
+        persist_organization(ingest_synthetic(200, net_id=1, exchanges=30))
+        persist_organization(ingest_synthetic(200, net_id=2, exchanges=30))
+        top = ExchangeSummary.objects.select_related('exchange').order_by('-total_capacity').first()
+        with self.assertNumQueries(1):
+            response = self.client.get('/exchanges/')
+        self.assertContains(response, f'https://www.peeringdb.com/ix/{top.exchange.ix_id}')
+        self.assertEqual(list(response.context['summaries'])[0], top)
+
+
+class ExportTests(TestCase):
+
+    def setUp(self):
+        self.org_ids = [persist_organization(ingest_synthetic(200, net_id=net_id, exchanges=30)).id
+                        for net_id in range(1, 4)]
+
+    def expected_rows(self, org_ids):
+        return [
+            [row[0], str(row[1]), row[2], row[3], str(row[4]), str(row[5]), str(row[6])]
+            for row in Connectivity.objects.filter(org_name_id__in=org_ids).order_by('org_name_id', 'id').values_list(
+                'org_name__name', 'org_name__asn', 'peer_name__name', 'exchange__name', 'exchange__ix_id',
+                'connection_count', 'capacity')
+        ]
+
+    def test_export_csv(self):
+        response = self.client.get('/export/connections.csv')
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.reader(io.StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(rows[0], ['organization', 'asn', 'peer_organization', 'exchange', 'ix_id',
+                                   'connection_count', 'capacity'])
+        self.assertEqual(rows[1:], self.expected_rows(self.org_ids))
+
+    def test_export_ndjson(self):
+        response = self.client.get('/export/connections.ndjson', {'org': [self.org_ids[2], self.org_ids[0]]})
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([[str(value) for value in row.values()] for row in rows],
+                         self.expected_rows([self.org_ids[0], self.org_ids[2]]))
+        self.assertEqual(rows[0]['organization'], 'Synthetic Network 1')
+
+    def test_export_unknown_org(self):
+        self.assertEqual(self.client.get('/export/connections.csv', {'org': 404}).status_code, 404)
+        self.assertEqual(self.client.get('/export/connections.csv', {'org': 'x'}).status_code, 404)
+        self.assertEqual(self.client.get('/export/connections.xml').status_code, 404)
+
+
+class OrgDataViewTests(TestCase):
+
+    def test_org_data_view(self):
+        org_class = ingest_synthetic(2000, exchanges=200)
+        org_record = persist_organization(org_class)
+        peer_capacity = sorted(((org_data['total_po_speed'], peer_org) for peer_org, org_data in
+                                org_class.peer_info.items()), key=lambda peer: (-peer[0], peer[1]))
+        # Organization, peer count, peer page and its connections.
+        with self.assertNumQueries(4):
+            response = self.client.get(f'/orgs/{org_record.id}/')
+        self.assertEqual(list(response.context['conn_table']), [peer for _, peer in peer_capacity[:25]])
+        with self.assertNumQueries(4):
+            response = self.client.get(f'/orgs/{org_record.id}/', {'page': 2})
+        conn_table = response.context['conn_table']
+        self.assertEqual(list(conn_table), [peer for _, peer in peer_capacity[25:50]])
+        peer_org = peer_capacity[25][1]
+        self.assertEqual(len(conn_table[peer_org]), len(org_class.peer_info[peer_org]['peer_sets']))
+        capacities = [connection['capacity'] for connection in conn_table[peer_org]]
+        self.assertEqual(capacities, sorted(capacities, reverse=True))
+
+    def test_org_data_view_missing(self):
+        self.assertEqual(self.client.get('/orgs/404/').status_code, 404)
+
+
+@override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+class DiagramViewTests(TestCase):
+
+    def setUp(self):
+        self.org_ids = [persist_organization(ingest_synthetic(40, net_id=net_id, exchanges=8)).id
+                        for net_id in range(1, 11)]
+
+    def tearDown(self):
+        cache.clear()
+
+    def api_url(self, org_ids):
+        return f'/api/compare/{"/".join(map(str, org_ids))}.json'
+
+    def test_diagram_view(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/compare/{self.org_ids[1]}/{self.org_ids[0]}/')
+        self.assertContains(response, 'Synthetic Network 1')
+        self.assertContains(response, self.api_url(self.org_ids[:2]))
+
+    def test_compare_api_query_count(self):
+        for org_ids in (self.org_ids[:2], self.org_ids):
+            with self.assertNumQueries(2):
+                response = self.client.get(self.api_url(org_ids))
+            spec = response.json()
+            self.assertEqual(spec['labels'][:len(org_ids)], [f'Synthetic Network {net_id}'
+                                                             for net_id in range(1, len(org_ids) + 1)])
+            self.assertEqual(len(spec['source']), len(spec['target']))
+            self.assertEqual(len(spec['source']), len(spec['value']))
+
+    def test_compare_api_etag(self):
+        url = self.api_url(self.org_ids[:2])
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        etag = response['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        # A second client without the spec is served from cache.
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        spec = response.json()
+
+        # Refreshing an organization changes its data version: the same URL no longer matches the ETag
+        # and the spec is built again instead of being read from the cache entry of the old version.
+        dataset = synthetic_network(40, exchanges=8, net_id=2)
+        for netixlan in dataset['netixlan']:
+            netixlan['speed'] *= 2
+        refresh_organization(Organization.objects.get(id=self.org_ids[1]), backend=FixtureBackend(dataset))
+        with self.assertNumQueries(2):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertNotEqual(response.json()['value'], spec['value'])
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+    def test_diagram_view_invalid_ids(self):
+        self.assertEqual(self.client.get(f'/compare/{self.org_ids[0]}/404/').status_code, 404)
+        self.assertEqual(self.client.get(f'/compare/{self.org_ids[0]}+1/').status_code, 404)
+        self.assertEqual(self.client.get(self.api_url([self.org_ids[0], 404])).status_code, 404)
+
+
+class OrganizationSearchTests(TestCase):
+
+    def setUp(self):
+        self.orgs = [Organization.objects.create(name=f'Network {index:03d}', asn=64500 + index)
+                     for index in range(120)]
+        Organization.objects.create(name='Example  CDN', asn=65551)
+
+    def test_name_normalized(self):
+        self.assertEqual(Organization.objects.get(asn=65551).name_normalized, 'example cdn')
+
+    def test_clean_name(self):
+        with CaptureQueriesContext(connection) as queries:
+            form = OrganizationForm({'name': 'EXAMPLE cdn'})
+            self.assertFalse(form.is_valid())
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('LIKE', queries[0]['sql'])
+        self.assertIn('partial or full match', form.errors['name'][0])
+        self.assertFalse(OrganizationForm({'name': 'network  01'}).is_valid())
+        self.assertTrue(OrganizationForm({'name': 'Another Network'}).is_valid())
+        plan = Organization.objects.filter(**name_prefix_filter('network 01')).explain()
+        self.assertRegex(plan, r'SEARCH execsite_organization USING (COVERING )?INDEX '
+                               r'execsite_organization_name_normalized')
+
+    def test_org_search(self):
+        with CaptureQueriesContext(connection) as queries:
+            results = self.client.get('/api/orgs/search', {'q': 'network 11'}).json()['results']
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('LIKE', queries[0]['sql'])
+        self.assertEqual([org['name'] for org in results], [f'Network {index}' for index in range(110, 120)])
+        results = self.client.get('/api/orgs/search', {'q': 'Example', 'limit': 5}).json()['results']
+        self.assertEqual(results, [{'id': Organization.objects.get(asn=65551).id, 'name': 'Example  CDN',
+                                    'asn': 65551}])
+        self.assertEqual(len(self.client.get('/api/orgs/search', {'q': 'net', 'limit': 3}).json()['results']), 3)
+        self.assertEqual(self.client.get('/api/orgs/search').json(), {'results': []})
+
+    def test_keyset_pagination(self):
+        seen = []
+        url = '/'
+        while url:
+            with self.assertNumQueries(1):
+                response = self.client.get(url)
+            page = response.context['page']
+            seen.extend(org.id for org in response.context['orgs'])
+            url = f'/?after={page["next"]}' if page['next'] else None
+        self.assertEqual(seen, sorted(Organization.objects.values_list('id', flat=True)))
+
+        last = self.orgs[-1].id
+        response = self.client.get(f'/compare/?before={last}')
+        self.assertEqual([org.id for org in response.context['orgs']], [org.id for org in self.orgs[-51:-1]])
+        self.assertEqual(response.context['page']['previous'], self.orgs[-51].id)
+        self.assertEqual(response.context['page']['next'], self.orgs[-2].id)
+        self.assertEqual(self.client.get('/?after=x').status_code, 404)
+
+
+@override_settings(PERFORMANCE_METRICS=True)
+class PerformanceMetricsTests(TestCase):
+
+    def setUp(self):
+        METRICS.views.clear()
+
+    def test_server_timing(self):
+        org_record = persist_organization(ingest_synthetic(200))
+        response = self.client.get(f'/orgs/{org_record.id}/')
+        timings = dict(metric.split(';', 1) for metric in response['Server-Timing'].split(', '))
+        self.assertEqual(list(timings), ['db', 'peeringdb', 'render', 'total'])
+        self.assertIn('desc="4 queries"', timings['db'])
+        self.assertIn('desc="0 calls"', timings['peeringdb'])
+
+        metrics = self.client.get('/metrics').content.decode()
+        self.assertIn('execsite_db_queries_total{view="org_data_view"} 4', metrics)
+        self.assertIn('execsite_request_duration_seconds_count{view="org_data_view"} 1', metrics)
+        self.assertIn('execsite_render_duration_seconds_bucket{view="org_data_view",le="+Inf"} 1', metrics)
+
+    def test_peeringdb_lookups(self):
+        dataset = synthetic_network(100, exchanges=10)
+
+        def view(request):
+            org_class = prdb_org(asn=dataset['net'][0]['asn'], backend=FixtureBackend(dataset), stream=True)
+            org_class.peer_metrics()
+            return HttpResponse()
+
+        response = PerformanceMiddleware(view)(RequestFactory().get('/'))
+        # The network, its netixlan records, then the exchanges and their netixlan records in one batch each.
+        self.assertIn('peeringdb;dur=', response['Server-Timing'])
+        self.assertIn('desc="4 calls"', response['Server-Timing'])
+        self.assertEqual(METRICS.views['unresolved'].peeringdb_calls, 4)
+
+    def test_streaming_export(self):
+        org_record = persist_organization(ingest_synthetic(200))
+        response = self.client.get('/export/connections.ndjson', {'org': org_record.id})
+        # The organization check runs in the view, the connections are read while the content is sent.
+        self.assertIn('desc="1 queries"', response['Server-Timing'])
+        self.assertNotIn('export_view', METRICS.views)
+        rows = b''.join(response.streaming_content).splitlines()
+        self.assertEqual(len(rows), Connectivity.objects.count())
+        self.assertEqual(METRICS.views['export_view'].db_queries, 2)
+        self.assertEqual(METRICS.views['export_view'].total.snapshot()['count'], 1)
+
+    @override_settings(PERFORMANCE_METRICS=False)
+    def test_disabled(self):
+        self.assertNotIn('Server-Timing', self.client.get('/'))
+        self.assertEqual(self.client.get('/metrics').status_code, 404)
+
+
+class BenchmarkSuiteTests(TestCase):
+
+    def test_compare(self):
+        baseline = {'results': {'peer_organization[synthetic-1000]': {'records': 1000, 'seconds': 0.010},
+                                'persist_organization[synthetic-1000]': {'records': 1000, 'seconds': 0.100},
+                                'sankey_diagram[2x10]': {'records': 20, 'seconds': 0.0001}}}
+        results = {'results': {'peer_organization[synthetic-1000]': {'records': 1000, 'seconds': 0.012},
+                               'persist_organization[synthetic-1000]': {'records': 1000, 'seconds': 0.200},
+                               'sankey_diagram[2x10]': {'records': 20, 'seconds': 0.0004},
+                               'peer_metrics[synthetic-1000]': {'records': 1000, 'seconds': 1}}}
+        # Within tolerance, below the noise floor and missing from the baseline are not regressions.
+        self.assertEqual(compare(results, baseline), [('persist_organization[synthetic-1000]', 0.100, 0.200)])
+
+
+class PeeringDBStubTests(TestCase):
+
+    def serve(self, stub):
+        server = StubServer(stub).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        return server
+
+    def test_stub_organization(self):
+        dataset = recorded_network('prdb_net_1956')
+        expected = prdb_org('Twitch', backend=FixtureBackend(dataset)).PeerOrganization()
+        # Every other request fails and is retried by the client.
+        stub = PeeringDBStub(dataset, error_rate=0.5, seed=1)
+        waits = []
+        client = PeeringDBClient(self.serve(stub).url, retries=20, sleep=waits.append)
+        with self.assertLogs('utilities.prdb_requests.client', 'WARNING'):
+            self.assertEqual(prdb_org('Twitch', backend=client, max_workers=4).PeerOrganization(), expected)
+            self.assertEqual(prdb_org(asn=46489, backend=client, stream=True).PeerOrganization(), expected)
+        self.assertEqual(len(waits), stub.stats[503])
+        self.assertGreater(stub.stats[200], 0)
+
+    def test_stub_faults(self):
+        now = [0.0]
+        stub = PeeringDBStub(recorded_network('prdb_net_1956'), rate_limit=0.5, burst=2, clock=lambda: now[0])
+        self.assertEqual(stub.handle('/api/ix/70', {})[0], 200)
+        self.assertEqual(stub.handle('/api/net/1', {})[0], 404)
+        status, headers, body = stub.handle('/api/net', {'asn': '46489'})
+        self.assertEqual(status, 429)
+        self.assertEqual(headers['Retry-After'], '2')
+        now[0] = 2.0
+        status, headers, body = stub.handle('/api/net', {'asn': '46489'})
+        self.assertEqual(json.loads(body)['data'][0]['name'], 'Twitch')
+        self.assertEqual(stub.stats, {200: 2, 404: 1, 429: 1})
+
+        delays = []
+        stub = PeeringDBStub({}, latency='uniform:0.1,0.2', error_rate=1, error_status=502, sleep=delays.append)
+        self.assertEqual(stub.handle('/api/net', {})[0], 502)
+        self.assertTrue(0.1 <= delays[0] <= 0.2)
+        self.assertEqual(latency_distribution('0.05')(None), 0.05)
+        with self.assertRaises(ValueError):
+            latency_distribution('pareto:1')
+
+
+class LoadTestTests(LiveServerTestCase):
+
+    def test_run_load(self):
+        for net_id in (1, 2, 3):
+            persist_organization(ingest_synthetic(100, net_id=net_id))
+        targets = discover_targets(self.live_server_url, ['Synthetic Network 4'])
+        self.assertEqual(targets['org_ids'], sorted(Organization.objects.values_list('id', flat=True)))
+        samples, elapsed = run_load(self.live_server_url, targets, parse_mix(DEFAULT_MIX), concurrency=2,
+                                    requests_total=40)
+        summary = summarize(samples, elapsed)
+        self.assertEqual(summary['all']['requests'], 40)
+        self.assertEqual(summary['all']['errors'], 0)
+        self.assertEqual(sum(stats['requests'] for route, stats in summary.items() if route != 'all'), 40)
+        self.assertTrue(summary['all']['p50'] <= summary['all']['p95'] <= summary['all']['p99'])
+
+    def test_parse_mix(self):
+        self.assertEqual(parse_mix('site=3, org=7,query'), {'site': 3, 'org': 7, 'query': 1})
+        with self.assertRaises(ValueError):
+            parse_mix('admin=1')
+        with self.assertRaises(ValueError):
+            parse_mix('site=0')
+        self.assertEqual([percentile(list(range(1, 101)), fraction) for fraction in (0.5, 0.95, 0.99)],
+                         [50, 95, 99])
+
+
+class StartupTests(TestCase):
+
+    def test_startup_budget(self):
+        # Without PeeringDB credentials or heavy modules. Time and memory depend on the machine and are
+        # checked against the budget by `python -m benchmarks.startup`.
+        budget = load_budget()
+        for probe in PROBES:
+            self.assertEqual(measure(probe, budget['heavy_modules'])['modules'], [])
+        self.assertEqual(over_budget('wsgi', {'seconds': 1, 'rss_mb': 1, 'modules': ['plotly']},
+                                     {'probes': {'wsgi': {'seconds': 0.5, 'rss_mb': 100}}}),
+                         ['wsgi: seconds 1 exceeds the budget of 0.5', 'wsgi: imports plotly at startup'])
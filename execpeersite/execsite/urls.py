@@ -1,5 +1,7 @@
 from django.conf.urls import url
-from execsite.views import site_view, org_data_view, diagram_view, query_view, compare_view
+from execsite.views import site_view, org_data_view, diagram_view, query_view, compare_view, job_view, \
+    job_status_view, compare_api_view, org_search_view, refresh_view, \
+    exchange_summary_view, export_view, metrics_view
 
 urlpatterns = [
     url(r'^$',
@@ -8,7 +10,15 @@ urlpatterns = [
     url(r'^orgs/(?P<org_id>\d+)/$',
         org_data_view,
         name="organizations"),
+    url(r'^orgs/(?P<org_id>\d+)/refresh/$', refresh_view, name='refresh'),
+    url(r'^export/connections\.(?P<export_format>csv|ndjson)$', export_view, name='export'),
+    url(r'^exchanges/$', exchange_summary_view, name='exchanges'),
+    url(r'^api/orgs/search$', org_search_view, name='org_search'),
     url(r'^compare/$', compare_view),
     url(r'compare/(?P<org_ids>[\d+/]+)/$', diagram_view),
-    url(r'^query/', query_view)
+    url(r'^api/compare/(?P<org_ids>[\d/]+)\.json$', compare_api_view, name='compare_api'),
+    url(r'^query/', query_view),
+    url(r'^jobs/(?P<job_id>\d+)/$', job_view, name='job'),
+    url(r'^jobs/(?P<job_id>\d+)\.json$', job_status_view, name='job_status'),
+    url(r'^metrics$', metrics_view, name='metrics'),
 ]
\ No newline at end of file
@@ -1,110 +1,334 @@
-from django.shortcuts import render, redirect
-from execsite.models import OrganizationForm, Organization, PeerOrganization, Connectivity
-from utilities.prdb_requests.prdb_req import Organization as prdb_org
-from utilities.execsite_graphs.es_graphs import sankey_diagram
+import csv
+import json
+import hashlib
+import itertools
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db.models import F, Sum
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse, Http404
+from django.template.response import TemplateResponse
+from django.shortcuts import redirect, get_object_or_404
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import require_POST
+from execsite.middleware import METRICS
+from execsite.models import OrganizationForm, Organization, Connectivity, ExchangeSummary, IngestJob, normalize_name, \
+    name_prefix_filter
+from execsite.services import enqueue_ingest, enqueue_refresh
+from utilities.execsite_graphs.es_graphs import sankey_spec
+
+PEERS_PER_PAGE = 25
+# Rows fetched from the database at a time by the exports.
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_FIELDS = ('organization', 'asn', 'peer_organization', 'exchange', 'ix_id', 'connection_count', 'capacity')
+EXPORT_CONTENT_TYPES = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+ORGS_PER_PAGE = 50
+SEARCH_LIMIT = 10
+MAX_SEARCH_LIMIT = 50
+
+
+def keyset_page(request, queryset, per_page):
+    """
+    Page of a queryset ordered by id, addressed by the last id of the previous page (?after=)
+    or the first id of the next page (?before=), so the cost does not grow with the page number.
+    :param request: object passed from urls
+    :param queryset: queryset to paginate
+    :param per_page: objects per page
+    :return: {'objects': [...], 'previous': id to pass as before or None, 'next': id to pass as after or None}
+    """
+    try:
+        after = int(request.GET['after']) if 'after' in request.GET else None
+        before = int(request.GET['before']) if 'before' in request.GET else None
+    except ValueError:
+        raise Http404('Invalid page')
+    if before is not None:
+        objects = list(queryset.filter(id__lt=before).order_by('-id')[:per_page + 1])
+        has_more = len(objects) > per_page
+        objects = objects[:per_page][::-1]
+        return {'objects': objects,
+                'previous': objects[0].id if has_more else None,
+                'next': objects[-1].id if objects else None}
+    if after is not None:
+        queryset = queryset.filter(id__gt=after)
+    objects = list(queryset.order_by('id')[:per_page + 1])
+    has_more = len(objects) > per_page
+    objects = objects[:per_page]
+    return {'objects': objects,
+            'previous': objects[0].id if after is not None and objects else None,
+            'next': objects[-1].id if has_more else None}
 
 
 def site_view(request):
     """
-    Summary view displaying form for query and list of queried sites.
+    Summary view displaying form for query and list of queried sites, keyset paginated.
     :param request: object passed from urls
     :return: GET: site.jinja2 template
              POST: query_results.jinja2 template
     """
-    orgs = Organization.objects.all()
-    return render(request, 'site.jinja2', {'orgs': orgs})
+    page = keyset_page(request, Organization.objects.all(), ORGS_PER_PAGE)
+    return TemplateResponse(request, 'site.jinja2', {'orgs': page['objects'], 'page': page})
+
+
+def org_search_view(request):
+    """
+    Autocomplete for organization names: prefix match on the indexed normalized name, one query.
+    :param request: object passed from urls, with q and optional limit parameters
+    :return: JSON {'results': [{'id': ..., 'name': ..., 'asn': ...}, ...]}
+    """
+    query = normalize_name(request.GET.get('q', ''))
+    try:
+        limit = min(max(int(request.GET.get('limit', SEARCH_LIMIT)), 1), MAX_SEARCH_LIMIT)
+    except ValueError:
+        limit = SEARCH_LIMIT
+    if not query:
+        return JsonResponse({'results': []})
+    results = Organization.objects.filter(**name_prefix_filter(query)) \
+        .order_by('name_normalized', 'id').values('id', 'name', 'asn')[:limit]
+    return JsonResponse({'results': list(results)})
 
 
 def org_data_view(request, **kwargs):
     """
     Detailed view for organizations.
+    Peers are grouped, sorted by total capacity and paginated in the database; connections are fetched
+    for the peers on the requested page only.
     :param request: object passed from urls
     :param kwargs: named regex groups from urls
     :return: render query_results.jinja2 template
     """
-    org_record = Organization.objects.get(id=kwargs['org_id'])
-    peer_org_records = PeerOrganization.objects.filter(org=org_record)
-    connection_records = Connectivity.objects.filter(org_name=org_record)
-    conn_table = {peer_org:[conn_record for conn_record in connection_records if conn_record.peer_name == peer_org] for peer_org in peer_org_records}
-    return render(request, 'query_results.jinja2', {'org_record': org_record, \
-                                                    'peer_records': peer_org_records, \
-                                                    'conn_records': connection_records, \
-                                                    'conn_table': conn_table})
+    org_record = get_object_or_404(Organization, id=kwargs['org_id'])
+    peer_totals = Connectivity.objects.filter(org_name=org_record) \
+        .values('peer_name_id', 'peer_name__name') \
+        .annotate(total_capacity=Sum('capacity')) \
+        .order_by('-total_capacity', 'peer_name__name')
+    page = Paginator(peer_totals, PEERS_PER_PAGE).get_page(request.GET.get('page'))
+    conn_table = {peer['peer_name_id']: (peer['peer_name__name'], []) for peer in page}
+    connection_records = Connectivity.objects.filter(org_name=org_record, peer_name_id__in=list(conn_table)) \
+        .order_by('-capacity', 'exchange__name') \
+        .values('peer_name_id', 'connection_count', 'capacity', exchange_point=F('exchange__name'))
+    for connection in connection_records:
+        conn_table[connection['peer_name_id']][1].append(connection)
+    return TemplateResponse(request, 'query_results.jinja2', {'org_record': org_record, \
+                                                    'page': page, \
+                                                    'conn_table': dict(conn_table.values())})
+
+
+def exchange_summary_view(request):
+    """
+    Stored connections grouped by exchange point, from the maintained exchange summaries in a single query.
+    :param request: object passed from urls
+    :return: exchanges.jinja2 template
+    """
+    summaries = ExchangeSummary.objects.filter(org_count__gt=0).select_related('exchange') \
+        .order_by('-total_capacity', 'exchange_id')
+    return TemplateResponse(request, 'exchanges.jinja2', {'summaries': summaries})
+
+
+class Echo:
+    """
+    File-like object returning what is written to it, so csv.writer rows can be streamed.
+    """
+
+    def write(self, value):
+        return value
+
+
+def export_view(request, export_format):
+    """
+    Stream stored connections as CSV or newline delimited JSON. Rows are written as they are read from the database
+    in chunks, so memory use does not depend on the size of the export.
+    :param request: object passed from urls, with optional repeated org parameters limiting the export
+    :param export_format: csv or ndjson
+    :return: streaming response
+    """
+    connections = Connectivity.objects.all()
+    if request.GET.getlist('org'):
+        org_ids = parse_org_ids('/'.join(request.GET.getlist('org')))
+        found = set(Organization.objects.filter(id__in=org_ids).values_list('id', flat=True))
+        if len(found) != len(org_ids):
+            raise Http404(f'Unknown organization ids: {sorted(set(org_ids) - found)}')
+        connections = connections.filter(org_name_id__in=org_ids)
+    rows = connections.order_by('org_name_id', 'id').values_list(
+        'org_name__name', 'org_name__asn', 'peer_name__name', 'exchange__name', 'exchange__ix_id',
+        'connection_count', 'capacity').iterator(chunk_size=EXPORT_CHUNK_SIZE)
+
+    if export_format == 'csv':
+        writer = csv.writer(Echo())
+        content = (writer.writerow(row) for row in itertools.chain([EXPORT_FIELDS], rows))
+    else:
+        content = (json.dumps(dict(zip(EXPORT_FIELDS, row))) + '\n' for row in rows)
+    response = StreamingHttpResponse(content, content_type=EXPORT_CONTENT_TYPES[export_format])
+    response['Content-Disposition'] = f'attachment; filename="connections.{export_format}"'
+    return response
+
+
+@require_POST
+def refresh_view(request, org_id):
+    """
+    Queue a refresh of an organization from PeeringDB.
+    :param request: object passed from urls
+    :param org_id: Organization id
+    :return: redirect to the status page of the queued refresh
+    """
+    job = enqueue_refresh(get_object_or_404(Organization, id=org_id))
+    return redirect(f'/jobs/{job.id}/')
+
+
+def parse_org_ids(org_ids):
+    """
+    :param org_ids: organization ids separated by /, as captured from the compare URL
+    :return: sorted list of unique organization ids
+    :raise Http404: when an id is not a number
+    """
+    try:
+        return sorted({int(org_id) for org_id in org_ids.strip('/').split('/')})
+    except ValueError:
+        raise Http404(f'Invalid organization ids: {org_ids}')
+
+
+def compared_organizations(org_ids):
+    """
+    :param org_ids: sorted list of unique organization ids
+    :return: {org_id: (name, data_version)}
+    :raise Http404: when an organization does not exist
+    """
+    org_records = {org_id: (name, data_version) for org_id, name, data_version in
+                   Organization.objects.filter(id__in=org_ids).values_list('id', 'name', 'data_version')}
+    if len(org_records) != len(org_ids):
+        raise Http404(f'Unknown organization ids: {sorted(set(org_ids) - set(org_records))}')
+    return org_records
+
+
+def comparison_digest(org_records):
+    """
+    :param org_records: {org_id: (name, data_version)}
+    :return: digest of the organizations at their current data versions, used as ETag and cache key
+    """
+    versions = ','.join(f'{org_id}.{org_records[org_id][1]}' for org_id in sorted(org_records))
+    return hashlib.sha1(versions.encode()).hexdigest()
 
 
 def diagram_view(request, org_ids):
-    uniq_orgs = set(org_ids.split('/'))
-    org_conn_records = []
-    for org in uniq_orgs:
-        org_record = Organization.objects.get(id=org)
-        connection_record = Connectivity.objects.filter(org_name=org_record)
-        org_conn_records.append((org_record, connection_record))
-    graph = sankey_diagram(org_conn_records)
-    return render(request, 'sankey_diagram.jinja2', {'graph': graph})
+    """
+    Page for the Sankey diagram comparing organizations. The diagram is drawn in the browser from compare_api_view.
+    :param request: object passed from urls
+    :param org_ids: organization ids separated by /
+    :return: render sankey_diagram.jinja2 template
+    """
+    org_ids = parse_org_ids(org_ids)
+    org_records = compared_organizations(org_ids)
+    return TemplateResponse(request, 'sankey_diagram.jinja2', {
+        'org_names': [org_records[org_id][0] for org_id in org_ids],
+        'spec_url': f'/api/compare/{"/".join(map(str, org_ids))}.json',
+    })
+
+
+@gzip_page
+def compare_api_view(request, org_ids):
+    """
+    Compact Sankey spec comparing organizations, see sankey_spec().
+    The ETag changes with the data version of the organizations: revalidation costs one query and returns 304,
+    otherwise the spec is served from cache and built with one more query on a miss.
+    :param request: object passed from urls
+    :param org_ids: organization ids separated by /
+    :return: JSON response
+    """
+    org_ids = parse_org_ids(org_ids)
+    org_records = compared_organizations(org_ids)
+    digest = comparison_digest(org_records)
+    etag = quote_etag(digest)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        cache_key = f'sankey-spec:{digest}'
+        content = cache.get(cache_key)
+        if content is None:
+            connections = {org_id: [] for org_id in org_ids}
+            connection_records = Connectivity.objects.filter(org_name__in=org_ids).order_by('id') \
+                .values_list('org_name_id', 'exchange__name', 'capacity')
+            for org_id, exchange_point, capacity in connection_records:
+                connections[org_id].append((exchange_point, capacity))
+            content = json.dumps(sankey_spec([(org_records[org_id][0], connections[org_id]) for org_id in org_ids]),
+                                 separators=(',', ':'))
+            cache.set(cache_key, content)
+        response = HttpResponse(content, content_type='application/json')
+    response['ETag'] = etag
+    # Browsers keep the spec but revalidate it on every view.
+    patch_cache_control(response, no_cache=True)
+    return response
+
 
 def query_view(request):
     """
     Summary view displaying form for query and list of queried sites.
     :param request: object passed from urls
-    :return: GET: site.jinja2 template
-             POST: query_results.jinja2 template
+    :return: GET: query.jinja2 template
+             POST: redirect to the status page of the queued ingestion
     """
     if request.method == 'POST':
         form = OrganizationForm(request.POST)
         if form.is_valid():
-            org_name = form.cleaned_data['name']
-            # Retrieve net information
-            org_class = prdb_org(org_name)
-            # Retrieve peers, org_metrics, and peer_metrics
-            org_class.peer_metrics()
-            # Populate Organization Model
-            org_record = Organization(name=org_class.org_name)
-            org_record.asn = org_class.asn
-            org_record.total_peers = org_class.total_peers
-            org_record.total_capacity = org_class.total_capacity
-            org_record.unique_orgs = org_class.unique_orgs
-            org_record.total_exchanges = org_class.total_exchanges
-            org_record.save()
-
-            # Populate PeerOrganization Model
-            for peer_org in org_class.peer_info:
-                for peer_set in org_class.peer_info[peer_org]['peer_sets']:
-                    for exchange_point, peer_set_data in peer_set.items():
-                        try:
-                            PeerOrganization.objects.get(name=peer_org)
-                        except PeerOrganization.DoesNotExist:
-                            peer_org_record = PeerOrganization(name=peer_org)
-                            peer_org_record.save()
-
-                        # Populate Connection Information
-                        try:
-                            Connectivity.objects.get(
-                                org_name=org_record,
-                                exchange_point=exchange_point
-                            )
-                        except Connectivity.DoesNotExist:
-                            connection_record = Connectivity(
-                                org_name=org_record,
-                                peer_name=PeerOrganization.objects.get(name=peer_org)
-                            )
-                            connection_record.exchange_point = exchange_point
-                            connection_record.connection_count = peer_set_data['conn_count']
-                            connection_record.capacity = peer_set_data['capacity']
-                            connection_record.save()
-            return redirect(f'/orgs/{org_record.id}')
+            # Retrieval from PeeringDB and persistence run in the ingest_worker process
+            job = enqueue_ingest(form.cleaned_data['name'])
+            return redirect(f'/jobs/{job.id}/')
         else:
             error = form.errors
             form = OrganizationForm()
             orgs = Organization.objects.all()
-            return render(request, 'query.jinja2', {'form': form, 'orgs': orgs, 'error': error})
+            return TemplateResponse(request, 'query.jinja2', {'form': form, 'orgs': orgs, 'error': error})
     form = OrganizationForm()
     orgs = Organization.objects.all()
-    return render(request, 'query.jinja2', {'form': form, 'orgs': orgs})
+    return TemplateResponse(request, 'query.jinja2', {'form': form, 'orgs': orgs})
+
+def job_view(request, job_id):
+    """
+    Progress of a queued ingestion. Redirects to the organization once it is stored, unless it was deleted since.
+    :param request: object passed from urls
+    :param job_id: IngestJob id
+    :return: job_status.jinja2 template
+    """
+    job = get_object_or_404(IngestJob, id=job_id)
+    if job.organization_url:
+        return redirect(job.organization_url)
+    return TemplateResponse(request, 'job_status.jinja2', {'job': job})
+
+
+def job_status_view(request, job_id):
+    """
+    Progress of a queued ingestion, polled by job_status.jinja2.
+    :param request: object passed from urls
+    :param job_id: IngestJob id
+    :return: JSON job status
+    """
+    job = get_object_or_404(IngestJob, id=job_id)
+    return JsonResponse({
+        'name': job.name,
+        'status': job.status,
+        'status_display': job.get_status_display(),
+        'ixs_resolved': job.ixs_resolved,
+        'ixs_total': job.ixs_total,
+        'rows_written': job.rows_written,
+        'error': job.error,
+        'url': job.organization_url,
+        'organization_deleted': job.organization_deleted,
+    })
+
 
 def compare_view(request):
-    orgs = Organization.objects.all()
     if request.method == 'POST':
         org_list = request.POST.getlist('orgs')
         org_list = '/'.join(org_list)
         return redirect(f'/compare/{org_list}')
-    return render(request, 'compare.jinja2', {'orgs': orgs})
+    page = keyset_page(request, Organization.objects.all(), ORGS_PER_PAGE)
+    return TemplateResponse(request, 'compare.jinja2', {'orgs': page['objects'], 'page': page})
+
+
+def metrics_view(request):
+    """
+    Request timings aggregated by PerformanceMiddleware in this process, in the Prometheus text format.
+    :return: 404 unless settings.PERFORMANCE_METRICS is set
+    """
+    if not settings.PERFORMANCE_METRICS:
+        raise Http404('Performance metrics are disabled')
+    return HttpResponse(METRICS.exposition(), content_type='text/plain; version=0.0.4; charset=utf-8')
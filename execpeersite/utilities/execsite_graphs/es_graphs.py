@@ -1,82 +1,59 @@
-from plotly.offline import plot
-from plotly import graph_objs as go
+def sankey_data(org_conn_records):
+    """
+    Build the Sankey trace of organizations and the exchanges they connect at.
 
+    Logic:
+    Exchanges connected to Multiple Organizations:
+        - Manage even index and odd index organizations by placing them on opposite sides of diagram
+        - If even index, place organization on source side of diagram
+        - If odd index, place organization on target side of diagram
+        - If an exchange is connected to all even index organizations,
+            place organization on target side of diagram
+        - If an exchange is connected to all odd index organizations,
+            place organization on source side of diagram
 
-def sankey_diagram(org_conn_records):
-    def process_conn_set(exchange_name, exchange_index, conn_set, src=None):
-        org_index = conn_set[0]
-        # Convert capacity from Mbps to Gbps
-        capacity = conn_set[2] / 1000
-        if src == 'Organization':
-            if exchange_name in data['node']['label']:
-                data['link']['source'].append(org_index)
-                data['link']['target'].append(exchange_index)
-                data['link']['value'].append(capacity)
-            else:
-                data['node']['label'].append(exchange_name)
-                data['link']['source'].append(org_index)
-                data['link']['target'].append(exchange_index)
-                data['link']['value'].append(capacity)
-        elif src == 'Exchange':
-            if exchange_name in data['node']['label']:
-                data['link']['target'].append(org_index)
-                data['link']['source'].append(exchange_index)
-                data['link']['value'].append(capacity)
-            else:
-                data['node']['label'].append(exchange_name)
-                data['link']['target'].append(org_index)
-                data['link']['source'].append(exchange_index)
-                data['link']['value'].append(capacity)
+    Exchanges connected to Single Organization:
+        - If even index, place organization on target side of diagram
+        - If odd index, place organization on source side of diagram
 
-    def process_exchange_records(exchange_entry, src=None):
-        exchange_index = exchange_entry[0]
-        exchange_name = exchange_entry[1][0]
-        conn_sets = exchange_entry[1][1]
-
-        # Manage exchanges that are explicit in src/tgt (i.e. All index even or odd)
-        if src == 'Organization':
-            for conn_set in conn_sets:
-                process_conn_set(exchange_name, exchange_index, conn_set, src=src)
-        elif src == 'Exchange':
-            for conn_set in conn_sets:
-                process_conn_set(exchange_name, exchange_index, conn_set, src=src)
-
-        # Manage exchanges that are connected to multiple organizations
-        elif not src:
-            if len(conn_sets) > 1:
-                for conn_set in conn_sets:
-                    org_index = conn_set[0]
-                    # Process even index, place org on source side of diagram
-                    if not org_index % 2:
-                        process_conn_set(exchange_name, exchange_index, conn_set, src='Organization')
-                    # Process odd index, place org on target side of diagram
-                    else:
-                        process_conn_set(exchange_name, exchange_index, conn_set, src='Exchange')
+    :param org_conn_records: [(org_name, [(exchange_point, capacity), ...]), ...]
+    :return: plotly sankey trace as a dict
+    """
+    # Use dict to get a unique set of keys (exchanges) for all organizations
+    data_input = {}
+    link_count = 0
+    for org_index, (org_name, conn_record) in enumerate(org_conn_records):
+        for exchange_point, capacity in conn_record:
+            data_input.setdefault(exchange_point, []).append((org_index, capacity))
+            link_count += 1
 
-            # Manage exchanges that are connected to a single organization
-            elif len(conn_sets) == 1:
-                for conn_set in conn_sets:
-                    org_index = conn_set[0]
-                    # Process even index, place org on target side of diagram
-                    if not org_index % 2:
-                        process_conn_set(exchange_name, exchange_index, conn_set, src='Exchange')
-                    # Process odd index, place org on source side of diagram
-                    else:
-                        process_conn_set(exchange_name, exchange_index, conn_set, src='Organization')
+    labels = [org_name for org_name, conn_record in org_conn_records]
+    label_index = {}
+    for index, label in enumerate(labels):
+        label_index.setdefault(label, index)
+    source = [0] * link_count
+    target = [0] * link_count
+    value = [0.0] * link_count
 
-    data_input = {}
-    # Use dict to get a unique set of keys (exchanges) for all organizations
-    for i, org_conn_record in enumerate(org_conn_records):
-        org_record = org_conn_record[0]
-        conn_record = org_conn_record[1]
-        for conn in conn_record:
-            conn_set = [(i, org_record.name, conn.capacity)]
-            if conn.exchange_point in data_input:
-                data_input[conn.exchange_point].extend(conn_set)
+    link = 0
+    # Exchange node indexes start one past the organizations, as they always have.
+    for exchange_index, (exchange_name, conn_sets) in enumerate(data_input.items(), len(org_conn_records) + 1):
+        if exchange_name not in label_index:
+            label_index[exchange_name] = len(labels)
+            labels.append(exchange_name)
+        parities = {org_index % 2 for org_index, capacity in conn_sets}
+        # Mixed parity: even index organizations are sources. Otherwise odd index organizations are sources.
+        org_source_parity = 0 if len(parities) > 1 else 1
+        for org_index, capacity in conn_sets:
+            if org_index % 2 == org_source_parity:
+                source[link], target[link] = org_index, exchange_index
             else:
-                data_input.update({conn.exchange_point: conn_set})
+                source[link], target[link] = exchange_index, org_index
+            # Convert capacity from Mbps to Gbps
+            value[link] = capacity / 1000
+            link += 1
 
-    data = dict(
+    return dict(
         type='sankey',
         orientation="h",
         valueformat=',3r',
@@ -89,46 +66,36 @@ def sankey_diagram(org_conn_records):
                 color="black",
                 width=0.5
             ),
-            label=[org_record.name for org_record, conn_record in org_conn_records],
+            label=labels,
         ),
         link=dict(
-            source=[],
-            target=[],
-            value=[],
+            source=source,
+            target=target,
+            value=value,
         ))
 
-    for exchange in enumerate(data_input.items(), len(org_conn_records)+1):
-        '''
-        Logic:
-        Exchanges connected to Multiple Organizations:
-            - Manage even index and odd index organizations by placing them on opposite sides of diagram
-            - If even index, place organization on source side of diagram
-            - If odd index, place organization on target side of diagram
-            - If an exchange is connected to all even index organizations, 
-                place organization on target side of diagram
-            - If an exchange is connected to all odd index organizations, 
-                place organization on source side of diagram
-        
-        Exchanges connected to Single Organization:
-            - If even index, place organization on target side of diagram
-            - If odd index, place organization on source side of diagram
-        '''
-        # Manage exchanges that are connected to multiple organizations
-        conn_sets = exchange[1][1]
 
-        if len(conn_sets) > 1:
-            # If index is even, place org on source side of diagram
-            # Unless ALL index are even for exchange; place org on target side of diagram
-            if all(not conn_set[0] % 2 for conn_set in conn_sets):
-                process_exchange_records(exchange, src='Exchange')
-                continue
-            # If index is odd, place org on source side of diagram
-            # Unless ALL index are odd for exchange; place org on target side of diagram
-            elif all(conn_set[0] % 2 for conn_set in conn_sets):
-                process_exchange_records(exchange, src='Organization')
-                continue
+def sankey_spec(org_conn_records):
+    """
+    Compact form of the Sankey trace for client side rendering. Styling is left to the page.
+    :param org_conn_records: [(org_name, [(exchange_point, capacity), ...]), ...]
+    :return: {'labels': [...], 'source': [...], 'target': [...], 'value': [...]}
+    """
+    data = sankey_data(org_conn_records)
+    return dict(labels=data['node']['label'], **data['link'])
+
+
+def sankey_diagram(org_conn_records):
+    """
+    Build a Sankey diagram of organizations and the exchanges they connect at.
+    :param org_conn_records: [(org_name, [(exchange_point, capacity), ...]), ...]
+    :return: plotly div
+    """
+    # Plotly takes most of the app's import time and memory, and pages render the spec client side.
+    from plotly.offline import plot
+    from plotly import graph_objs as go
 
-        process_exchange_records(exchange)
+    data = sankey_data(org_conn_records)
 
     layout = dict(
         font=dict(
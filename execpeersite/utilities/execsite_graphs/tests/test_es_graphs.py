@@ -0,0 +1,52 @@
+from ..es_graphs import sankey_data, sankey_spec, sankey_diagram
+'''
+Test functions in the es_graphs module:
+- sankey_data()
+  - Output matches the original list based builder for:
+    - Exchanges shared by even and odd index organizations
+    - Exchanges shared only by odd index organizations
+    - Exchanges connected to a single organization
+    - Exchange names equal to an organization name
+- sankey_spec()
+- sankey_diagram()
+'''
+
+ORG_CONN_RECORDS = [
+    ('Org A', [('IX 1', 10000), ('IX 2', 20000), ('IX 3', 1000)]),
+    ('Org B', [('IX 1', 100000), ('IX 4', 10000)]),
+    ('Org C', [('IX 2', 10000), ('IX 4', 40000), ('IX 5', 10000), ('Org A', 1000)]),
+    ('Org D', [('IX 1', 10000), ('IX 5', 20000), ('IX 6', 20000)]),
+]
+
+
+def test_sankey_data():
+    data = sankey_data(ORG_CONN_RECORDS)
+    assert data['node']['label'] == ['Org A', 'Org B', 'Org C', 'Org D', 'IX 1', 'IX 2', 'IX 3', 'IX 4', 'IX 5',
+                                     'IX 6']
+    assert data['link'] == {
+        'source': [0, 5, 5, 6, 6, 7, 8, 2, 2, 9, 10, 3],
+        'target': [5, 1, 3, 0, 2, 0, 1, 8, 9, 3, 2, 11],
+        'value': [10.0, 100.0, 10.0, 20.0, 10.0, 1.0, 10.0, 40.0, 10.0, 20.0, 1.0, 20.0],
+    }
+
+
+def test_sankey_data_empty():
+    data = sankey_data([('Org A', []), ('Org B', [])])
+    assert data['node']['label'] == ['Org A', 'Org B']
+    assert data['link'] == {'source': [], 'target': [], 'value': []}
+
+
+def test_sankey_spec():
+    data = sankey_data(ORG_CONN_RECORDS)
+    assert sankey_spec(ORG_CONN_RECORDS) == {
+        'labels': data['node']['label'],
+        'source': data['link']['source'],
+        'target': data['link']['target'],
+        'value': data['link']['value'],
+    }
+
+
+def test_sankey_diagram():
+    div = sankey_diagram(ORG_CONN_RECORDS)
+    assert div.startswith('<div')
+    assert 'IX 6' in div
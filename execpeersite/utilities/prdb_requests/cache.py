@@ -0,0 +1,185 @@
+#!/usr/bin/python3
+'''
+
+Response caches for the PeeringDB client
+'''
+import os
+import json
+import time
+import sqlite3
+import tempfile
+import threading
+from collections import OrderedDict
+from urllib.parse import urlencode
+from decouple import config
+
+# Cache backend: none, memory (per process) or sqlite (shared by every process using the same file).
+PEERING_DB_CACHE = config('PEERING_DB_CACHE', default='none')
+PEERING_DB_CACHE_TTL = config('PEERING_DB_CACHE_TTL', default=3600, cast=float)
+PEERING_DB_CACHE_SIZE = config('PEERING_DB_CACHE_SIZE', default=10000, cast=int)
+PEERING_DB_CACHE_PATH = config('PEERING_DB_CACHE_PATH',
+                               default=os.path.join(tempfile.gettempdir(), 'peeringdb_cache.sqlite3'))
+
+
+def cache_key(path, params):
+    """
+    :param path: relative URL path to PeeringDB API root
+    :param params: requests parameters
+    :return: key independent of parameter order, i.e. /ix?depth=0&id__in=1,2
+    """
+    return f'{path}?{urlencode(sorted((key, str(value)) for key, value in params.items()))}'
+
+
+class ResponseCache:
+    """
+    Base class for response caches. Values are stored serialized, so callers always receive their own copy.
+    """
+
+    def __init__(self, ttl=PEERING_DB_CACHE_TTL, max_entries=PEERING_DB_CACHE_SIZE, clock=time.time):
+        """
+        :param ttl: seconds an entry stays valid
+        :param max_entries: entries kept before the least recently used are evicted
+        :param clock: function returning the current time in seconds
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        :return: cached value or None on a miss
+        """
+        value = self._get(key)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(value)
+
+    def set(self, key, value):
+        evicted = self._set(key, json.dumps(value))
+        with self._lock:
+            self.evictions += evicted
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions, 'entries': len(self)}
+
+    def _get(self, key):
+        raise NotImplementedError
+
+    def _set(self, key, value):
+        """
+        :return: number of entries evicted to stay within max_entries
+        """
+        raise NotImplementedError
+
+    def __len__(self):
+        raise NotImplementedError
+
+
+class MemoryCache(ResponseCache):
+    """
+    In process LRU cache with TTL expiry.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._entries = OrderedDict()
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires <= self.clock():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def _set(self, key, value):
+        with self._lock:
+            self._entries[key] = (self.clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            evicted = 0
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                evicted += 1
+            return evicted
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteCache(ResponseCache):
+    """
+    LRU cache with TTL expiry stored in a SQLite file. Every process opening the same file,
+    i.e. each gunicorn worker, shares the entries. Counters are kept per process.
+    """
+
+    def __init__(self, path=PEERING_DB_CACHE_PATH, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self._local = threading.local()
+        with self._connection() as connection:
+            connection.execute('CREATE TABLE IF NOT EXISTS response_cache '
+                               '(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL, '
+                               'accessed REAL NOT NULL)')
+            connection.execute('CREATE INDEX IF NOT EXISTS response_cache_accessed ON response_cache (accessed)')
+
+    def _connection(self):
+        # sqlite3 connections cannot be shared between threads.
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30)
+            connection.execute('PRAGMA journal_mode=WAL')
+            self._local.connection = connection
+        return connection
+
+    def _get(self, key):
+        now = self.clock()
+        with self._connection() as connection:
+            row = connection.execute('SELECT value, expires FROM response_cache WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            if row[1] <= now:
+                connection.execute('DELETE FROM response_cache WHERE key = ? AND expires <= ?', (key, now))
+                return None
+            connection.execute('UPDATE response_cache SET accessed = ? WHERE key = ?', (now, key))
+            return row[0]
+
+    def _set(self, key, value):
+        now = self.clock()
+        with self._connection() as connection:
+            connection.execute('INSERT OR REPLACE INTO response_cache (key, value, expires, accessed) '
+                               'VALUES (?, ?, ?, ?)', (key, value, now + self.ttl, now))
+            connection.execute('DELETE FROM response_cache WHERE expires <= ?', (now,))
+            overflow = connection.execute('SELECT COUNT(*) FROM response_cache').fetchone()[0] - self.max_entries
+            if overflow <= 0:
+                return 0
+            connection.execute('DELETE FROM response_cache WHERE key IN '
+                               '(SELECT key FROM response_cache ORDER BY accessed LIMIT ?)', (overflow,))
+            return overflow
+
+    def __len__(self):
+        return self._connection().execute('SELECT COUNT(*) FROM response_cache').fetchone()[0]
+
+
+def make_cache(backend=PEERING_DB_CACHE):
+    """
+    :param backend: none, memory or sqlite
+    :return: ResponseCache instance or None when caching is disabled
+    """
+    if backend == 'memory':
+        return MemoryCache()
+    if backend == 'sqlite':
+        return SQLiteCache()
+    if backend in ('', 'none'):
+        return None
+    raise ValueError(f'Unknown PeeringDB cache backend: {backend}')
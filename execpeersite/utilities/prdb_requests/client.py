@@ -0,0 +1,196 @@
+#!/usr/bin/python3
+'''
+
+Pooled HTTP client for the PeeringDB API
+'''
+import re
+import time
+import random
+import logging
+import threading
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+import requests
+from requests.adapters import HTTPAdapter
+from decouple import config
+from .cache import cache_key
+from .stream import iter_json_array
+
+PEERING_DB_TIMEOUT = config('PEERING_DB_TIMEOUT', default=30, cast=float)
+PEERING_DB_RETRIES = config('PEERING_DB_RETRIES', default=4, cast=int)
+PEERING_DB_BACKOFF = config('PEERING_DB_BACKOFF', default=0.5, cast=float)
+PEERING_DB_POOL_SIZE = config('PEERING_DB_POOL_SIZE', default=16, cast=int)
+# Upper bound for a single wait, whether it came from backoff or a Retry-After header.
+MAX_RETRY_WAIT = 60
+RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+# Bytes read from the response body at a time when streaming.
+STREAM_CHUNK_SIZE = 64 * 1024
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, float('inf'))
+LOGGER = logging.getLogger(__name__)
+
+
+def endpoint_name(path):
+    """
+    Collapse object ids so that /ix/26 and /ix/18 are recorded as the same endpoint.
+    :param path: relative URL path to PeeringDB API root
+    :return: endpoint name, i.e. /ix/{id}
+    """
+    return re.sub(r'/\d+', '/{id}', path)
+
+
+def retry_after(response):
+    """
+    Parse a Retry-After header given either in seconds or as an HTTP date.
+    :param response: requests response
+    :return: seconds to wait or None when the header is absent or invalid
+    """
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+class LatencyHistogram:
+    """
+    Thread safe latency histogram with Prometheus style upper bounds, in seconds.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        with self._lock:
+            self.count += 1
+            self.sum += seconds
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    self.counts[i] += 1
+                    break
+
+    def snapshot(self):
+        """
+        :return: {'count': n, 'sum': seconds, 'buckets': [(upper_bound, cumulative_count), ...]}
+        """
+        with self._lock:
+            cumulative = 0
+            buckets = []
+            for bound, count in zip(self.buckets, self.counts):
+                cumulative += count
+                buckets.append((bound, cumulative))
+            return {'count': self.count, 'sum': self.sum, 'buckets': buckets}
+
+
+class PeeringDBClient:
+
+    def __init__(self, base_url, timeout=PEERING_DB_TIMEOUT, retries=PEERING_DB_RETRIES,
+                 backoff=PEERING_DB_BACKOFF, pool_size=PEERING_DB_POOL_SIZE, sleep=time.sleep, cache=None):
+        """
+        Initialize a keep-alive session shared by every PeeringDB request.
+        :param base_url: PeeringDB API root
+        :param timeout: seconds to wait for a connection and for each read
+        :param retries: number of retries after the first attempt for 429/5xx responses and connection errors
+        :param backoff: base of the exponential backoff, in seconds
+        :param pool_size: connections kept open per host. Should cover the number of concurrent lookups.
+        :param sleep: function used to wait between attempts
+        :param cache: ResponseCache for successful responses, None to always query PeeringDB
+        """
+        self.base_url = base_url
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.sleep = sleep
+        self.cache = cache
+        self.latency = {}
+        self._lock = threading.Lock()
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def get(self, path, cache=True, **params):
+        """
+        GET request to PeeringDB with retries on rate limiting, server errors and connection errors.
+        :param path: relative URL path to PeeringDB API root
+        :param cache: False to query PeeringDB even when the response is cached. The new response replaces it.
+        :param params: requests parameters
+        :return: decoded json document
+        """
+        if self.cache is None:
+            return self.request(path, **params)
+        key = cache_key(path, params)
+        json_data = self.cache.get(key) if cache else None
+        if json_data is None:
+            json_data = self.request(path, **params)
+            self.cache.set(key, json_data)
+        return json_data
+
+    def request(self, path, **params):
+        """
+        GET request to PeeringDB bypassing the cache. See get().
+        """
+        return self._send(path, params).json()
+
+    def stream(self, path, **params):
+        """
+        GET request to PeeringDB parsing the data array as it is received. Bypasses the cache.
+        Retries only apply until the response status is received.
+        :param path: relative URL path to PeeringDB API root
+        :param params: requests parameters
+        :return: generator of the objects in data
+        """
+        response = self._send(path, params, stream=True)
+        try:
+            yield from iter_json_array(response.iter_content(chunk_size=STREAM_CHUNK_SIZE))
+        finally:
+            response.close()
+
+    def _send(self, path, params, stream=False):
+        """
+        :return: successful requests response
+        """
+        for attempt in range(self.retries + 1):
+            start = time.perf_counter()
+            try:
+                response = self.session.get(f'{self.base_url}{path}', params=params, timeout=self.timeout,
+                                            stream=stream)
+            except (requests.ConnectionError, requests.Timeout) as exc:
+                self.observe(path, time.perf_counter() - start)
+                if attempt == self.retries:
+                    raise
+                wait = self.backoff_time(attempt)
+                LOGGER.warning(f'PeeringDB request {path} failed ({exc}). Retrying in {wait:.2f}s')
+            else:
+                self.observe(path, time.perf_counter() - start)
+                if response.status_code not in RETRY_STATUSES or attempt == self.retries:
+                    response.raise_for_status()
+                    return response
+                response.close()
+                wait = retry_after(response)
+                wait = self.backoff_time(attempt) if wait is None else min(wait, MAX_RETRY_WAIT)
+                LOGGER.warning(f'PeeringDB request {path} returned {response.status_code}. Retrying in {wait:.2f}s')
+            self.sleep(wait)
+
+    def backoff_time(self, attempt):
+        """
+        Exponential backoff with full jitter.
+        :param attempt: zero based attempt number
+        :return: seconds to wait
+        """
+        return random.uniform(0, min(MAX_RETRY_WAIT, self.backoff * 2 ** attempt))
+
+    def observe(self, path, seconds):
+        endpoint = endpoint_name(path)
+        with self._lock:
+            histogram = self.latency.setdefault(endpoint, LatencyHistogram())
+        histogram.observe(seconds)
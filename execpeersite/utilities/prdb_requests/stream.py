@@ -0,0 +1,109 @@
+#!/usr/bin/python3
+'''
+
+Incremental parsing of PeeringDB API documents
+'''
+import json
+import codecs
+
+WHITESPACE = ' \t\n\r'
+DECODER = json.JSONDecoder()
+
+
+class _Buffer:
+    """
+    Text read so far from an iterable of byte chunks. Consumed text is dropped as parsing moves forward,
+    so the buffer only holds the value being decoded.
+    """
+
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+        self.text = ''
+        self.pos = 0
+        self.exhausted = False
+
+    def fill(self):
+        """
+        Read the next chunk.
+        :return: False when the body is exhausted
+        """
+        if self.exhausted:
+            return False
+        self.text = self.text[self.pos:]
+        self.pos = 0
+        for chunk in self.chunks:
+            text = self.decoder.decode(chunk) if isinstance(chunk, bytes) else chunk
+            if text:
+                self.text += text
+                return True
+        self.text += self.decoder.decode(b'', final=True)
+        self.exhausted = True
+        return False
+
+    def peek(self):
+        """
+        :return: next character that is not whitespace, '' at the end of the body
+        """
+        while True:
+            while self.pos < len(self.text) and self.text[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            if not self.fill():
+                return ''
+
+    def expect(self, characters):
+        character = self.peek()
+        if not character or character not in characters:
+            raise ValueError(f'Expected one of {characters!r} at offset {self.pos}, found {character!r}')
+        self.pos += 1
+        return character
+
+    def value(self):
+        """
+        Decode the next JSON value. A value is only accepted once the character following it has been read,
+        so numbers split across chunks are not cut short.
+        """
+        self.peek()
+        while True:
+            try:
+                value, end = DECODER.raw_decode(self.text, self.pos)
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+                continue
+            if end < len(self.text) or self.exhausted:
+                self.pos = end
+                return value
+            self.fill()
+
+
+def iter_json_array(chunks, key='data'):
+    """
+    Yield the items of a top level array, i.e. data in {"meta": {...}, "data": [...]},
+    without holding the whole document in memory.
+    :param chunks: iterable of bytes or str, i.e. response.iter_content()
+    :param key: key of the array in the top level object
+    :return: generator of decoded items
+    """
+    buffer = _Buffer(chunks)
+    buffer.expect('{')
+    if buffer.peek() == '}':
+        return
+    while True:
+        name = buffer.value()
+        buffer.expect(':')
+        if name == key:
+            buffer.expect('[')
+            if buffer.peek() == ']':
+                buffer.pos += 1
+            else:
+                while True:
+                    yield buffer.value()
+                    if buffer.expect(',]') == ']':
+                        break
+        else:
+            buffer.value()
+        if buffer.expect(',}') == '}':
+            return
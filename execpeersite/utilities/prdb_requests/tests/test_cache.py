@@ -0,0 +1,107 @@
+import os
+import tempfile
+import responses
+from ..cache import MemoryCache, SQLiteCache, cache_key
+from ..client import PeeringDBClient
+'''
+Test functions in the cache module:
+- class: MemoryCache, SQLiteCache
+  - LRU eviction once max_entries is reached
+  - TTL expiry
+  - hit/miss/eviction counters
+  - SQLiteCache entries shared between instances using the same file
+- PeeringDBClient.get() answers repeated queries from the cache
+  - cache=False queries PeeringDB and replaces the cached response
+'''
+
+BASE_URL = 'https://peeringdb.test/api'
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def _sqlite_path():
+    return os.path.join(tempfile.mkdtemp(), 'cache.sqlite3')
+
+
+def _check_lru(cache):
+    cache.set('a', {'data': [1]})
+    cache.clock.now += 1
+    cache.set('b', {'data': [2]})
+    cache.clock.now += 1
+    assert cache.get('a') == {'data': [1]}
+    cache.clock.now += 1
+    cache.set('c', {'data': [3]})
+    assert cache.get('b') is None
+    assert cache.get('a') == {'data': [1]}
+    assert cache.get('c') == {'data': [3]}
+    assert cache.stats() == {'hits': 3, 'misses': 1, 'evictions': 1, 'entries': 2}
+
+
+def _check_ttl(cache):
+    cache.set('a', {'data': [1]})
+    cache.clock.now += 59
+    assert cache.get('a') == {'data': [1]}
+    cache.clock.now += 1
+    assert cache.get('a') is None
+    assert len(cache) == 0
+
+
+def test_memory_cache_lru():
+    _check_lru(MemoryCache(ttl=60, max_entries=2, clock=Clock()))
+
+
+def test_memory_cache_ttl():
+    _check_ttl(MemoryCache(ttl=60, max_entries=2, clock=Clock()))
+
+
+def test_memory_cache_returns_copies():
+    cache = MemoryCache(ttl=60, max_entries=2)
+    cache.set('a', {'data': [1]})
+    cache.get('a')['data'].append(2)
+    assert cache.get('a') == {'data': [1]}
+
+
+def test_sqlite_cache_lru():
+    _check_lru(SQLiteCache(_sqlite_path(), ttl=60, max_entries=2, clock=Clock()))
+
+
+def test_sqlite_cache_ttl():
+    _check_ttl(SQLiteCache(_sqlite_path(), ttl=60, max_entries=2, clock=Clock()))
+
+
+def test_sqlite_cache_shared():
+    path = _sqlite_path()
+    SQLiteCache(path, ttl=60).set('a', {'data': [1]})
+    assert SQLiteCache(path, ttl=60).get('a') == {'data': [1]}
+
+
+def test_cache_key():
+    assert cache_key('/ix', {'id__in': '1,2', 'depth': 0}) == cache_key('/ix', {'depth': 0, 'id__in': '1,2'})
+    assert cache_key('/ix', {'id__in': '1,2'}) != cache_key('/ix', {'id__in': '1,3'})
+
+
+@responses.activate
+def test_client_cache():
+    responses.add(responses.GET, f'{BASE_URL}/ix/26', json={'data': [{'id': 26}]}, status=200)
+    cache = MemoryCache(ttl=60, max_entries=10)
+    client = PeeringDBClient(BASE_URL, cache=cache)
+    assert client.get('/ix/26') == client.get('/ix/26') == {'data': [{'id': 26}]}
+    assert len(responses.calls) == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+@responses.activate
+def test_client_cache_bypass():
+    responses.add(responses.GET, f'{BASE_URL}/ix/26', json={'data': [{'id': 26, 'name': 'old'}]}, status=200)
+    responses.add(responses.GET, f'{BASE_URL}/ix/26', json={'data': [{'id': 26, 'name': 'new'}]}, status=200)
+    client = PeeringDBClient(BASE_URL, cache=MemoryCache(ttl=60, max_entries=10))
+    assert client.get('/ix/26')['data'][0]['name'] == 'old'
+    assert client.get('/ix/26', cache=False)['data'][0]['name'] == 'new'
+    assert client.get('/ix/26')['data'][0]['name'] == 'new'
+    assert len(responses.calls) == 2
@@ -0,0 +1,113 @@
+import pytest
+import requests
+import responses
+from ..client import PeeringDBClient, LatencyHistogram, endpoint_name
+'''
+Test functions in the client module:
+- class: PeeringDBClient
+  - PeeringDBClient.get()
+    - retry on 5xx and connection errors with backoff
+    - Retry-After on 429
+    - raise once retries are exhausted
+    - latency histogram per endpoint
+  - PeeringDBClient.stream()
+- class: LatencyHistogram
+'''
+
+BASE_URL = 'https://peeringdb.test/api'
+
+
+def _client(**kwargs):
+    waits = []
+    client = PeeringDBClient(BASE_URL, backoff=0.5, sleep=waits.append, **kwargs)
+    return client, waits
+
+
+@responses.activate
+def test_get():
+    responses.add(responses.GET, f'{BASE_URL}/ix/26', json={'data': [{'id': 26}]}, status=200)
+    client, waits = _client()
+    assert client.get('/ix/26', depth=0) == {'data': [{'id': 26}]}
+    assert responses.calls[0].request.url == f'{BASE_URL}/ix/26?depth=0'
+    assert waits == []
+
+
+@responses.activate
+def test_get_retries_server_errors():
+    responses.add(responses.GET, f'{BASE_URL}/net', status=503)
+    responses.add(responses.GET, f'{BASE_URL}/net', body=requests.ConnectionError('reset'))
+    responses.add(responses.GET, f'{BASE_URL}/net', json={'data': []}, status=200)
+    client, waits = _client(retries=3)
+    assert client.get('/net') == {'data': []}
+    assert len(responses.calls) == 3
+    assert len(waits) == 2
+    assert 0 <= waits[0] <= 0.5 and 0 <= waits[1] <= 1
+
+
+@responses.activate
+def test_get_retry_after():
+    responses.add(responses.GET, f'{BASE_URL}/net', status=429, headers={'Retry-After': '7'})
+    responses.add(responses.GET, f'{BASE_URL}/net', json={'data': []}, status=200)
+    client, waits = _client()
+    client.get('/net')
+    assert waits == [7]
+
+
+@responses.activate
+def test_get_retries_exhausted():
+    responses.add(responses.GET, f'{BASE_URL}/net', status=502)
+    client, waits = _client(retries=2)
+    with pytest.raises(requests.HTTPError):
+        client.get('/net')
+    assert len(responses.calls) == 3
+    assert len(waits) == 2
+
+
+@responses.activate
+def test_get_client_error_not_retried():
+    responses.add(responses.GET, f'{BASE_URL}/net/0', status=404, json={'meta': {'error': 'Not found'}})
+    client, waits = _client()
+    with pytest.raises(requests.HTTPError):
+        client.get('/net/0')
+    assert len(responses.calls) == 1
+
+
+@responses.activate
+def test_latency_per_endpoint():
+    responses.add(responses.GET, f'{BASE_URL}/ix/4', json={'data': []}, status=200)
+    responses.add(responses.GET, f'{BASE_URL}/ix/18', json={'data': []}, status=200)
+    responses.add(responses.GET, f'{BASE_URL}/net', json={'data': []}, status=200)
+    client, waits = _client()
+    for path in ('/ix/4', '/ix/18', '/net'):
+        client.get(path)
+    assert set(client.latency) == {'/ix/{id}', '/net'}
+    assert client.latency['/ix/{id}'].count == 2
+    assert client.latency['/net'].count == 1
+
+
+@responses.activate
+def test_stream():
+    netixlans = [{'id': i, 'net_id': 1956, 'ix_id': i % 7, 'speed': 10000} for i in range(500)]
+    responses.add(responses.GET, f'{BASE_URL}/netixlan', status=503)
+    responses.add(responses.GET, f'{BASE_URL}/netixlan', json={'meta': {}, 'data': netixlans}, status=200)
+    client, waits = _client()
+    stream = client.stream('/netixlan', net_id=1956)
+    assert next(stream) == netixlans[0]
+    assert list(stream) == netixlans[1:]
+    assert len(waits) == 1
+    assert responses.calls[-1].request.url == f'{BASE_URL}/netixlan?net_id=1956'
+
+
+def test_endpoint_name():
+    assert endpoint_name('/net/1956') == '/net/{id}'
+    assert endpoint_name('/ix') == '/ix'
+
+
+def test_latency_histogram():
+    histogram = LatencyHistogram(buckets=(0.1, 1, float('inf')))
+    for seconds in (0.05, 0.5, 0.7, 12):
+        histogram.observe(seconds)
+    snapshot = histogram.snapshot()
+    assert snapshot['count'] == 4
+    assert snapshot['sum'] == pytest.approx(13.25)
+    assert snapshot['buckets'] == [(0.1, 1), (1, 3), (float('inf'), 4)]
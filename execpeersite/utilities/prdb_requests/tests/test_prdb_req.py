@@ -1,7 +1,10 @@
+import pytest
 import responses
 import json
+from urllib.parse import urlparse, parse_qs
 from decouple import config
-from prdb_req import Organization
+from .. import prdb_req
+from ..prdb_req import Organization, PeeringDBNotFound, chunk_values, get_client
 '''
 Test functions in the prdb_request module:
 - class: Organization
@@ -10,7 +13,14 @@ Test functions in the prdb_request module:
     - method: retrieve(path, **kwargs)
     - method: retrieve(path, json_return)
     - method: retrieve(path, json_return, **kwargs)
+  - Organization(asn=...)
+  - Organization() of an unknown network raises PeeringDBNotFound
+  - Organization(stream=True) reads netixlan records from /netixlan
+  - Organization.retrieve_many()
+    - method: retrieve_many(path, values) split into chunk_values()
+  - get_client() creates the client once per process
   - Organization.PeerOrganization()
+    - peers at exchanges missing from the /ix or /org responses are skipped
     - Test Cases:
       - patch variable:ixlan_set - self.retrieve function with result that returns a netixlan_set with the following:
         - At least two IX's that belong to the same organization
@@ -19,7 +29,7 @@ Test functions in the prdb_request module:
     - return org_peer_dict
     org_peer_dict[org_name] = {
                     'org_id': org_id,
-                    'peer_set': [{peer_name: {'conn_count': 1, 'capacity': new_peer_speed}}],
+                    'peer_set': [{peer_name: {'conn_count': 1, 'capacity': new_peer_speed, 'ix_id': ix_id}}],
                     'ix_set': ix_set,
                 }
   - Organization.metrics()
@@ -61,9 +71,151 @@ def test_retrieve_json_return():
     pass
 
 
+@responses.activate
+def test_organization_by_asn():
+    responses.add(responses.GET, f'{PEERING_DB_URL}/net', json=JSON_DATA, status=200)
+    org = Organization(asn=46489)
+    assert (org.org_name, org.asn, org.net_id) == ('Twitch', 46489, 1956)
+    assert parse_qs(urlparse(responses.calls[0].request.url).query) == {'asn': ['46489']}
+
+
+def _add_ix_responses(netixlan_set, missing_ixs=(), missing_orgs=()):
+    """
+    Register batched /ix and /org responses for every exchange in the netixlan set.
+    Exchanges are grouped into organizations by the first word of their name.
+    Exchange ids in missing_ixs and organization names in missing_orgs are left out of the responses.
+    """
+    org_ix_sets = {}
+    for peer in netixlan_set:
+        org_ix_sets.setdefault(peer['name'].split()[0], set()).add(peer['ix_id'])
+    ixs, orgs = {}, {}
+    for org_id, (org_name, ix_set) in enumerate(org_ix_sets.items(), 1):
+        if org_name not in missing_orgs:
+            orgs[org_id] = {'id': org_id, 'name': org_name, 'ix_set': sorted(ix_set)}
+        ixs.update({ix_id: {'id': ix_id, 'org_id': org_id} for ix_id in ix_set if ix_id not in missing_ixs})
+
+    def lookup(records):
+        def callback(request):
+            ids = parse_qs(urlparse(request.url).query)['id__in'][0].split(',')
+            return 200, {}, json.dumps({'data': [records[int(i)] for i in ids if int(i) in records]})
+        return callback
+
+    responses.add_callback(responses.GET, f'{PEERING_DB_URL}/ix', callback=lookup(ixs))
+    responses.add_callback(responses.GET, f'{PEERING_DB_URL}/org', callback=lookup(orgs))
+
+
+@responses.activate
+def test_organization_not_found():
+    responses.add(responses.GET, f'{PEERING_DB_URL}/net', json={'data': []}, status=200)
+    with pytest.raises(PeeringDBNotFound, match='No PeeringDB network named Unknown Network'):
+        Organization('Unknown Network')
+    with pytest.raises(PeeringDBNotFound, match='No PeeringDB network with ASN 64496'):
+        Organization(asn=64496)
+
+
+@responses.activate
+def test_peer_organization_concurrent():
+    netixlan_set = JSON_DATA['data'][0]['netixlan_set']
+    responses.add(responses.GET, f'{PEERING_DB_URL}/net', json=JSON_DATA, status=200)
+    responses.add(responses.GET, f'{PEERING_DB_URL}/net/1956', json=JSON_DATA, status=200)
+    _add_ix_responses(netixlan_set)
+
+    sequential = Organization('Twitch', max_workers=1).PeerOrganization()
+    ix_calls = [call for call in responses.calls if '/ix' in call.request.url]
+    assert len(ix_calls) == 1
+
+    concurrent = Organization('Twitch', max_workers=8).PeerOrganization()
+    assert concurrent == sequential
+    assert list(concurrent) == list(sequential)
+    assert sum(peer_data['conn_count'] for org_data in concurrent.values()
+               for peer_set in org_data['peer_sets'] for peer_data in peer_set.values()) == len(netixlan_set)
+
+
+@responses.activate
+def test_peer_organization_aggregation():
+    net = {'id': 1956, 'name': 'Twitch', 'asn': 46489, 'netixlan_set': [
+        {'ix_id': 4, 'name': 'Equinix Los Angeles', 'speed': 10000},
+        {'ix_id': 31, 'name': 'DE-CIX Frankfurt', 'speed': 20000},
+        {'ix_id': 1, 'name': 'Equinix Ashburn', 'speed': 100000},
+        {'ix_id': 4, 'name': 'Equinix Los Angeles', 'speed': 10000},
+    ]}
+    responses.add(responses.GET, f'{PEERING_DB_URL}/net', json={'data': [net]}, status=200)
+    responses.add(responses.GET, f'{PEERING_DB_URL}/net/1956', json={'data': [net]}, status=200)
+    _add_ix_responses(net['netixlan_set'])
+    assert Organization('Twitch').PeerOrganization() == {
+        'Equinix': {'org_id': 1, 'ix_set': [1, 4], 'peer_sets': [
+            {'Equinix Los Angeles': {'conn_count': 2, 'capacity': 20000, 'ix_id': 4}},
+            {'Equinix Ashburn': {'conn_count': 1, 'capacity': 100000, 'ix_id': 1}},
+        ]},
+        'DE-CIX': {'org_id': 2, 'ix_set': [31], 'peer_sets': [
+            {'DE-CIX Frankfurt': {'conn_count': 1, 'capacity': 20000, 'ix_id': 31}},
+        ]},
+    }
+
+
+@responses.activate
+def test_peer_organization_missing_ix():
+    net = {'id': 1956, 'name': 'Twitch', 'asn': 46489, 'netixlan_set': [
+        {'ix_id': 4, 'name': 'Equinix Los Angeles', 'speed': 10000},
+        {'ix_id': 31, 'name': 'DE-CIX Frankfurt', 'speed': 20000},
+        {'ix_id': 70, 'name': 'Netnod Stockholm', 'speed': 10000},
+    ]}
+    responses.add(responses.GET, f'{PEERING_DB_URL}/net', json={'data': [net]}, status=200)
+    responses.add(responses.GET, f'{PEERING_DB_URL}/net/1956', json={'data': [net]}, status=200)
+    _add_ix_responses(net['netixlan_set'], missing_ixs={31}, missing_orgs={'Netnod'})
+    assert Organization('Twitch').PeerOrganization() == {
+        'Equinix': {'org_id': 1, 'ix_set': [4], 'peer_sets': [
+            {'Equinix Los Angeles': {'conn_count': 1, 'capacity': 10000, 'ix_id': 4}},
+        ]},
+    }
+
+
+@responses.activate
+def test_peer_organization_stream():
+    netixlan_set = JSON_DATA['data'][0]['netixlan_set']
+    responses.add(responses.GET, f'{PEERING_DB_URL}/net', json=JSON_DATA, status=200)
+    responses.add(responses.GET, f'{PEERING_DB_URL}/net/1956', json=JSON_DATA, status=200)
+    responses.add(responses.GET, f'{PEERING_DB_URL}/netixlan', json={'meta': {}, 'data': netixlan_set}, status=200)
+    _add_ix_responses(netixlan_set)
+
+    loaded = Organization('Twitch', max_workers=1).PeerOrganization()
+    streamed = Organization('Twitch', max_workers=1, stream=True).PeerOrganization()
+    assert streamed == loaded
+    assert list(streamed) == list(loaded)
+    netixlan_calls = [call for call in responses.calls if '/netixlan' in call.request.url]
+    assert parse_qs(urlparse(netixlan_calls[0].request.url).query) == {'net_id': ['1956']}
+
+
+def test_chunk_values():
+    values = list(range(1000)) + [1, 2, 3]
+    chunks = list(chunk_values(values, max_length=100))
+    assert len(chunks) > 1
+    assert all(len(chunk) <= 100 for chunk in chunks)
+    assert [int(value) for chunk in chunks for value in chunk.split(',')] == list(range(1000))
+
+
+@responses.activate
+def test_retrieve_many(path='/ix'):
+    _add_ix_responses(JSON_DATA['data'][0]['netixlan_set'])
+    ix_ids = [4, 18, 4, 99999]
+    result = Organization.retrieve_many(path, ix_ids)
+    assert [ix['id'] for ix in result] == [4, 18]
+    assert parse_qs(urlparse(responses.calls[0].request.url).query)['id__in'] == ['4,18,99999']
+
+
 @responses.activate
 def test_retrieve_params_json_return(path='/net'):
     responses.add(responses.GET, f'{PEERING_DB_URL}{path}', json=JSON_DATA, status=200)
     asn, net_id = Organization.retrieve(path, json_return=['asn', 'id'], name__in='Twitch')
     assert asn == 46489
     assert net_id == 1956
+
+
+def test_get_client(monkeypatch):
+    client = get_client()
+    assert get_client() is client
+    assert client.base_url == PEERING_DB_URL
+    # A client inherited from a parent process is replaced.
+    monkeypatch.setattr(prdb_req, '_client_pid', -1)
+    assert get_client(create=False) is None
+    assert get_client() is not client
@@ -0,0 +1,45 @@
+import json
+import pytest
+from ..stream import iter_json_array
+'''
+Test functions in the stream module:
+- iter_json_array()
+  - Items match json.loads for every chunk size, including multi-byte characters split across chunks
+  - Keys before and after the array, empty documents and empty arrays
+  - Numbers split across chunks
+  - Invalid documents raise ValueError
+'''
+
+JSON_DATA = json.load(open('tests/data/prdb_net_1956', 'r'))
+
+
+def _chunks(body, size):
+    return (body[i:i + size] for i in range(0, len(body), size))
+
+
+@pytest.mark.parametrize('size', [1, 7, 64, 4096])
+def test_iter_json_array(size):
+    document = {'meta': {'generated': 1540000000.5}, 'data': JSON_DATA['data'][0]['netixlan_set'] + [
+        {'id': 1, 'name': 'Zürich Exchange ✓', 'speed': 12345678, 'notes': None, 'nested': {'a': [1, 2.5, True]}},
+    ]}
+    body = json.dumps(document, ensure_ascii=False, indent=1).encode()
+    assert list(iter_json_array(_chunks(body, size))) == document['data']
+
+
+def test_iter_json_array_keys():
+    body = b' {"meta": {"status": [1, {"x": "]"}]}, "data" : [ 1 , 23 , "a" ] , "after": 123}  '
+    assert list(iter_json_array(_chunks(body, 1))) == [1, 23, 'a']
+    assert list(iter_json_array([b'{"data": []}'])) == []
+    assert list(iter_json_array([b'{}'])) == []
+    assert list(iter_json_array([b'{"meta": {}}'])) == []
+
+
+def test_iter_json_array_numbers():
+    assert list(iter_json_array([b'{"data": [12', b'34, 5', b'6]}'])) == [1234, 56]
+
+
+def test_iter_json_array_invalid():
+    with pytest.raises(ValueError):
+        list(iter_json_array([b'{"data": [{"id": 1}, {"id": ']))
+    with pytest.raises(ValueError):
+        list(iter_json_array([b'[1, 2]']))